@@ -0,0 +1,31 @@
+"""unique subscription per user and event
+
+Revision ID: 3b9d4f1c2a7e
+Revises: ed1fa739ccc4
+Create Date: 2026-10-19 15:30:12.418250
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d4f1c2a7e'
+down_revision: Union[str, None] = 'ed1fa739ccc4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # keep the oldest row of every duplicated (event_id, user_id) pair
+    op.execute(
+        "DELETE FROM subscriptions WHERE id NOT IN "
+        "(SELECT MIN(id) FROM subscriptions GROUP BY event_id, user_id)"
+    )
+    op.create_unique_constraint('uq_subscription_event_user', 'subscriptions', ['event_id', 'user_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_subscription_event_user', 'subscriptions', type_='unique')
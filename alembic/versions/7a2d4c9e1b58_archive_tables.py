@@ -0,0 +1,54 @@
+"""archive tables for past events and scheduled_time index
+
+Revision ID: 7a2d4c9e1b58
+Revises: 0f6b8e2a4c93
+Create Date: 2026-10-19 16:41:12.530874
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a2d4c9e1b58'
+down_revision: Union[str, None] = '0f6b8e2a4c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_events_scheduled_time'), 'events', ['scheduled_time'], unique=False)
+    op.create_table('archived_events',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('description', sa.String(), nullable=False),
+    sa.Column('location', sa.String(), nullable=False),
+    sa.Column('scheduled_time', sa.DateTime(), nullable=False),
+    sa.Column('creation_time', sa.DateTime(), nullable=True),
+    sa.Column('popularity', sa.Integer(), nullable=True),
+    sa.Column('created_by', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['created_by'], ['users.username'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_archived_events_scheduled_time'), 'archived_events', ['scheduled_time'], unique=False)
+    op.create_table('archived_subscriptions',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['archived_events.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_archived_subscriptions_user_event', 'archived_subscriptions', ['user_id', 'event_id'],
+                    unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_archived_subscriptions_user_event', table_name='archived_subscriptions')
+    op.drop_table('archived_subscriptions')
+    op.drop_index(op.f('ix_archived_events_scheduled_time'), table_name='archived_events')
+    op.drop_table('archived_events')
+    op.drop_index(op.f('ix_events_scheduled_time'), table_name='events')
@@ -0,0 +1,26 @@
+"""subscriptions (user_id, event_id) index
+
+Revision ID: 8c41e2d7b5f0
+Revises: 3b9d4f1c2a7e
+Create Date: 2026-10-19 15:34:51.207733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41e2d7b5f0'
+down_revision: Union[str, None] = '3b9d4f1c2a7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_subscriptions_user_event', 'subscriptions', ['user_id', 'event_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_subscriptions_user_event', table_name='subscriptions')
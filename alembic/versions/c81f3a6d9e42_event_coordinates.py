@@ -0,0 +1,34 @@
+"""event coordinates and geohash index
+
+Revision ID: c81f3a6d9e42
+Revises: b3e58f0c2d17
+Create Date: 2026-10-19 18:02:47.218305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f3a6d9e42'
+down_revision: Union[str, None] = 'b3e58f0c2d17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in ('events', 'archived_events'):
+        op.add_column(table, sa.Column('latitude', sa.Float(), nullable=True))
+        op.add_column(table, sa.Column('longitude', sa.Float(), nullable=True))
+        op.add_column(table, sa.Column('geohash', sa.String(length=12), nullable=True))
+    op.create_index('ix_events_geohash_scheduled_time', 'events', ['geohash', 'scheduled_time'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_geohash_scheduled_time', table_name='events')
+    for table in ('events', 'archived_events'):
+        op.drop_column(table, 'geohash')
+        op.drop_column(table, 'longitude')
+        op.drop_column(table, 'latitude')
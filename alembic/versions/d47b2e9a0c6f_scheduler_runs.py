@@ -0,0 +1,42 @@
+"""scheduler runs table
+
+Revision ID: d47b2e9a0c6f
+Revises: c81f3a6d9e42
+Create Date: 2026-10-19 18:40:19.604127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd47b2e9a0c6f'
+down_revision: Union[str, None] = 'c81f3a6d9e42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('scheduler_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('scheduled_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('lag_seconds', sa.Float(), nullable=True),
+    sa.Column('duration_seconds', sa.Float(), nullable=True),
+    sa.Column('events_scanned', sa.Integer(), nullable=True),
+    sa.Column('reminders_sent', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_scheduler_runs_scheduled_at'), 'scheduler_runs', ['scheduled_at'], unique=False)
+    op.create_index('ix_scheduler_runs_job_id', 'scheduler_runs', ['job', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_scheduler_runs_job_id', table_name='scheduler_runs')
+    op.drop_index(op.f('ix_scheduler_runs_scheduled_at'), table_name='scheduler_runs')
+    op.drop_table('scheduler_runs')
@@ -0,0 +1,26 @@
+"""event version column for optimistic concurrency
+
+Revision ID: d52a9f0e6b13
+Revises: 8c41e2d7b5f0
+Create Date: 2026-10-19 15:40:27.911406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd52a9f0e6b13'
+down_revision: Union[str, None] = '8c41e2d7b5f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('events', 'version')
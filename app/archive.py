@@ -0,0 +1,47 @@
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, delete, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app import models
+
+# events scheduled longer ago than this are moved to the archive tables
+ARCHIVE_AFTER = timedelta(days=int(os.getenv("ARCHIVE_AFTER_DAYS", 30)))
+BATCH_SIZE = 1000
+
+EVENT_COLUMNS = [column.key for column in models.Event.__table__.columns]
+SUBSCRIPTION_COLUMNS = [column.key for column in models.Subscription.__table__.columns]
+
+
+def archive_events_before(db: Session, before: datetime, batch_size: int = BATCH_SIZE) -> int:
+    """Moves the events scheduled before `before`, with their subscriptions, to the archive tables.
+
+    Each batch is copied and deleted in its own transaction, so the job never holds long locks and an
+    interrupted run leaves no event in both places. Returns the number of events archived.
+    """
+    archived = 0
+    while True:
+        event_ids = db.scalars(select(models.Event.id)
+                               .where(models.Event.scheduled_time < before)
+                               .order_by(models.Event.scheduled_time)
+                               .limit(batch_size)).all()
+        if not event_ids:
+            return archived
+        db.execute(insert(models.ArchivedEvent).from_select(
+            EVENT_COLUMNS + ["archived_at"],
+            select(*models.Event.__table__.columns, literal(datetime.now(), DateTime))
+            .where(models.Event.id.in_(event_ids))))
+        db.execute(insert(models.ArchivedSubscription).from_select(
+            SUBSCRIPTION_COLUMNS,
+            select(*models.Subscription.__table__.columns).where(models.Subscription.event_id.in_(event_ids))))
+        db.execute(delete(models.Subscription).where(models.Subscription.event_id.in_(event_ids))
+                   .execution_options(synchronize_session=False))
+        db.execute(delete(models.Event).where(models.Event.id.in_(event_ids))
+                   .execution_options(synchronize_session=False))
+        db.commit()
+        archived += len(event_ids)
+
+
+def archive_past_events(db: Session) -> int:
+    return archive_events_before(db, datetime.now() - ARCHIVE_AFTER)
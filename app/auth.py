@@ -1,13 +1,17 @@
 from starlette import status
 
 from app import models
+from app.revocation import revocations
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from passlib.context import CryptContext
 from fastapi import HTTPException, Depends
 from sqlalchemy.orm import Session
 from app.database import get_db
+import logging
+import os
 import secrets
+import uuid
 import jwt
 
 
@@ -19,9 +23,32 @@ from app.models import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-SECRET_KEY = secrets.token_urlsafe(32)
+logger = logging.getLogger(__name__)
+
+
+def load_keys() -> Tuple[str, Dict[str, str]]:
+    """Reads the signing keys from JWT_KEYS="<kid>:<secret>,<kid>:<secret>"; the first one signs new tokens.
+
+    Keys that were rotated out stay listed until the tokens they signed expired, so neither a restart
+    nor a rotation logs users out, and every worker accepts the tokens of the others.
+    """
+    configured = os.getenv("JWT_KEYS")
+    if not configured:
+        logger.warning("JWT_KEYS is not set; tokens will not survive a restart or work across workers")
+        kid = secrets.token_hex(4)
+        return kid, {kid: secrets.token_urlsafe(32)}
+    keys = {}
+    for entry in configured.split(","):
+        kid, _, secret = entry.strip().partition(":")
+        keys[kid] = secret
+    return next(iter(keys)), keys
+
+
+ACTIVE_KID, KEYS = load_keys()
+SECRET_KEY = KEYS[ACTIVE_KID]
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 30))
 
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
@@ -32,11 +59,43 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    to_encode.setdefault("type", "access")
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM, headers={"kid": ACTIVE_KID})
     return encoded_jwt
 
 
+def create_refresh_token(username: str):
+    return create_access_token(data={"sub": username, "type": "refresh"},
+                               expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+
+
+def decode_token(token: str, token_type: str = "access") -> Optional[dict]:
+    """Returns the claims of a valid, unrevoked token of the given type, or None."""
+    try:
+        kid = jwt.get_unverified_header(token).get("kid", ACTIVE_KID)
+    except jwt.InvalidTokenError:
+        kid = ACTIVE_KID
+    key = KEYS.get(kid)
+    if key is None:
+        return None
+    try:
+        payload = jwt.decode(token, key, algorithms=[ALGORITHM])
+    except jwt.InvalidTokenError:
+        return None
+    if payload.get("type", "access") != token_type:
+        return None
+    if payload.get("jti") and revocations.is_revoked(payload["jti"]):
+        return None
+    return payload
+
+
+def revoke_token(db: Session, payload: dict) -> bool:
+    """Returns False if the token was already revoked."""
+    expires_at = datetime.fromtimestamp(payload["exp"], tz=timezone.utc).astimezone().replace(tzinfo=None)
+    return revocations.revoke(db, payload["jti"], expires_at)
+
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -66,7 +125,9 @@ def create_access_token_for_user(user: models.User):
 
 def get_user_name_from_token(token: str, db: Session = Depends(get_db)) -> Optional[str]:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
+        if payload is None:
+            return None
         user_id = payload.get("sub")
         # Check token expiration
         expiration_time = datetime.fromtimestamp(payload.get('exp')).replace(tzinfo=timezone.utc)
@@ -1,33 +1,129 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple
+
+from apscheduler.events import EVENT_JOB_SUBMITTED
+from apscheduler.executors.pool import ThreadPoolExecutor as SchedulerThreadPool
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from app import crud, models, schemas, database
+from app import crud, models, schemas, database, metrics, idempotency, archive, revocation, scheduler_stats
 from app.database import SessionLocal
 import logging
+import os
 
 logging.basicConfig(format='%(asctime)s - %(message)s', level=logging.INFO)
 logging.getLogger('apscheduler').setLevel(logging.WARNING)
 
 
 logger = logging.getLogger(__name__)
-scheduler = BackgroundScheduler()
 
+REMINDER_WINDOW = timedelta(minutes=30)
+REMINDER_CHUNK_SIZE = int(os.getenv("REMINDER_CHUNK_SIZE", 500))
+REMINDER_WORKERS = int(os.getenv("REMINDER_WORKERS", 4))
+# a run this late is skipped instead of started; the next tick covers the same window anyway
+MISFIRE_GRACE_SECONDS = 30
+
+scheduler = BackgroundScheduler(
+    executors={"default": SchedulerThreadPool(int(os.getenv("SCHEDULER_WORKERS", 4)))},
+    # never run a job twice at once, and run it once, not once per missed tick, after falling behind
+    job_defaults={"max_instances": 1, "coalesce": True, "misfire_grace_time": MISFIRE_GRACE_SECONDS},
+)
+scheduler.add_listener(metrics.record_job_lag, EVENT_JOB_SUBMITTED)
+scheduler.add_listener(scheduler_stats.record_run, scheduler_stats.RECORDED_EVENTS)
+
+reminder_executor = ThreadPoolExecutor(max_workers=REMINDER_WORKERS, thread_name_prefix="reminders")
+
+
+class ReminderResult(NamedTuple):
+    events_scanned: int
+    reminders_sent: int
 
-def send_reminder(db: Session, time_delta: timedelta):
-    upcoming_events = crud.get_upcoming_events(db, time_delta)
-    for event in upcoming_events:
-        subscribers = crud.get_subscribers(db, event_id=event.id)
-        for subscriber in subscribers:
+
+def send_chunk_reminders(events: List) -> int:
+    db = SessionLocal()
+    try:
+        subscriber_ids = crud.get_subscriber_ids(db, [event.id for event in events])
+    finally:
+        db.close()
+    sent = 0
+    for event in events:
+        for _ in subscriber_ids.get(event.id, ()):
             logger.info(f"Reminder: Event {event.id} is coming up at {event.scheduled_time}.")
+            sent += 1
+    return sent
+
+
+def send_reminder(db: Session, time_delta: timedelta) -> ReminderResult:
+    """Sends the reminders of the upcoming events in chunks on the reminder executor.
 
+    At most two chunks per worker are in flight, so a huge window is worked through in
+    bounded memory instead of being loaded at once.
+    """
+    events_scanned = reminders_sent = 0
+    pending = deque()
+    for chunk in crud.get_upcoming_event_chunks(db, time_delta, REMINDER_CHUNK_SIZE):
+        events_scanned += len(chunk)
+        pending.append(reminder_executor.submit(send_chunk_reminders, chunk))
+        if len(pending) >= 2 * REMINDER_WORKERS:
+            reminders_sent += pending.popleft().result()
+    while pending:
+        reminders_sent += pending.popleft().result()
+    return ReminderResult(events_scanned, reminders_sent)
 
-@scheduler.scheduled_job('interval', minutes=1)
+
+@scheduler.scheduled_job('interval', minutes=1, id='check_upcoming_events', max_instances=1, coalesce=True,
+                         misfire_grace_time=MISFIRE_GRACE_SECONDS)
 def check_upcoming_events():
     db = SessionLocal()
     try:
-        time_delta = timedelta(minutes=30)
-        send_reminder(db, time_delta)
+        with scheduler_stats.track_run('check_upcoming_events') as stats:
+            result = send_reminder(db, REMINDER_WINDOW)
+            stats.events_scanned, stats.reminders_sent = result.events_scanned, result.reminders_sent
+        return stats
     finally:
         db.close()
 
 
+@scheduler.scheduled_job('interval', hours=1, id='purge_idempotency_keys')
+def purge_idempotency_keys():
+    db = SessionLocal()
+    try:
+        purged = idempotency.store.purge_expired(db)
+        if purged:
+            logger.info(f"Purged {purged} expired idempotency keys")
+    finally:
+        db.close()
+
+
+@scheduler.scheduled_job('interval', hours=1, id='purge_revoked_tokens')
+def purge_revoked_tokens():
+    db = SessionLocal()
+    try:
+        purged = revocation.revocations.purge_expired(db)
+        if purged:
+            logger.info(f"Purged {purged} expired token revocations")
+    finally:
+        db.close()
+
+
+@scheduler.scheduled_job('interval', hours=1, id='archive_past_events')
+def archive_past_events():
+    db = SessionLocal()
+    try:
+        with scheduler_stats.track_run('archive_past_events') as stats:
+            archived = archive.archive_past_events(db)
+        if archived:
+            logger.info(f"Archived {archived} past events")
+        return stats
+    finally:
+        db.close()
+
+
+@scheduler.scheduled_job('interval', hours=1, id='purge_scheduler_runs')
+def purge_scheduler_runs():
+    db = SessionLocal()
+    try:
+        scheduler_stats.purge_old_runs(db)
+    finally:
+        db.close()
@@ -0,0 +1,62 @@
+import argparse
+import sys
+from pathlib import Path
+
+from sqlalchemy.exc import IntegrityError
+
+from app import event_io
+from app.database import SessionLocal
+from app.schemas import DataFormat
+
+
+def _format(path: str, fmt: str) -> DataFormat:
+    if fmt:
+        return DataFormat(fmt)
+    return DataFormat.ndjson if Path(path).suffix in (".ndjson", ".jsonl") else DataFormat.csv
+
+
+def import_events(args):
+    fmt = _format(args.file, args.format)
+    db = SessionLocal()
+    try:
+        with (sys.stdin.buffer if args.file == "-" else open(args.file, "rb")) as stream:
+            imported = event_io.import_events(db, stream, fmt, args.user)
+    except event_io.InvalidRow as e:
+        sys.exit(f"Import aborted, nothing was imported: {e}")
+    except IntegrityError:
+        sys.exit("Import aborted, nothing was imported: the file contains an event that already exists")
+    finally:
+        db.close()
+    print(f"Imported {imported} events", file=sys.stderr)
+
+
+def export_events(args):
+    fmt = _format(args.file, args.format)
+    with (sys.stdout.buffer if args.file == "-" else open(args.file, "wb")) as stream:
+        for chunk in event_io.export_events(fmt):
+            stream.write(chunk)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(required=True)
+
+    import_parser = commands.add_parser("import-events", help="import events from a CSV or NDJSON file")
+    import_parser.add_argument("file", help="file to read, or - for stdin")
+    import_parser.add_argument("--user", required=True, help="username recorded as the events' creator")
+    import_parser.add_argument("--format", choices=[fmt.value for fmt in DataFormat],
+                               help="defaults to ndjson for .ndjson/.jsonl files and csv otherwise")
+    import_parser.set_defaults(command=import_events)
+
+    export_parser = commands.add_parser("export-events", help="export all events to a CSV or NDJSON file")
+    export_parser.add_argument("file", help="file to write, or - for stdout")
+    export_parser.add_argument("--format", choices=[fmt.value for fmt in DataFormat],
+                               help="defaults to ndjson for .ndjson/.jsonl files and csv otherwise")
+    export_parser.set_defaults(command=export_events)
+
+    args = parser.parse_args(argv)
+    args.command(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
+from collections import defaultdict
 from datetime import datetime, timezone, timedelta
-from typing import Any
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import desc, and_
+from sqlalchemy import desc, and_, or_, select, delete, tuple_, update
 
-from sqlalchemy.orm import Session
-from app import models
+from sqlalchemy.orm import Session, load_only, raiseload
+from app import geo, models
 from app import schemas
 from app.models import User
 from app.schemas import UserCreate, SortField
 from app.auth import create_access_token_for_user, verify_password, get_password_hash
+from app.database import dialect_insert
 
 
 def create_user(db: Session, user_create: UserCreate):
@@ -27,6 +29,9 @@ def create_event(db: Session, event: schemas.EventCreate, username: str):
         scheduled_time=event.scheduled_time,
         creation_time=datetime.now(),
         popularity=event.popularity,
+        latitude=event.latitude,
+        longitude=event.longitude,
+        geohash=geo.encode_or_none(event.latitude, event.longitude),
         created_by=username
     )
     db.add(db_event)
@@ -35,30 +40,87 @@ def create_event(db: Session, event: schemas.EventCreate, username: str):
     return db_event
 
 
-def get_events(db: Session, skip: int = 0, limit: int = 100, sort_field: SortField = SortField.scheduled_time):
-    if sort_field == SortField.scheduled_time:
-        return db.query(models.Event).order_by(models.Event.scheduled_time).offset(skip).limit(limit).all()
-    elif sort_field == SortField.popularity:
-        return db.query(models.Event).order_by(models.Event.popularity).offset(skip).limit(limit).all()
-    elif sort_field == SortField.creation_time:
-        return db.query(models.Event).order_by(models.Event.creation_time).offset(skip).limit(limit).all()
-    else:
-        return db.query(models.Event).offset(skip).limit(limit).all()
+EVENT_FIELDS = {column.key: column for column in (
+    models.Event.description, models.Event.location, models.Event.scheduled_time, models.Event.popularity,
+    models.Event.latitude, models.Event.longitude, models.Event.id, models.Event.creation_time,
+    models.Event.created_by, models.Event.version)}
+
+EVENT_SORT_COLUMNS = {
+    SortField.scheduled_time: models.Event.scheduled_time,
+    SortField.popularity: models.Event.popularity,
+    SortField.creation_time: models.Event.creation_time,
+}
+
+
+def event_columns(fields: Optional[List[str]] = None):
+    if not fields:
+        return list(EVENT_FIELDS.values())
+    return [EVENT_FIELDS[name] for name in EVENT_FIELDS if name in fields]
+
+
+def get_events(db: Session, skip: int = 0, limit: int = 100, sort_field: SortField = SortField.scheduled_time,
+               fields: Optional[List[str]] = None):
+    # List queries never need relationships; raiseload turns an accidental lazy load into an error
+    query = db.query(models.Event).options(raiseload("*"))
+    if fields:
+        query = query.options(load_only(*event_columns(fields)))
+    if sort_field in EVENT_SORT_COLUMNS:
+        query = query.order_by(EVENT_SORT_COLUMNS[sort_field])
+    return query.offset(skip).limit(limit).all()
+
+
+def get_event_rows(db: Session, skip: int = 0, limit: int = 100, sort_field: SortField = SortField.scheduled_time,
+                   fields: Optional[List[str]] = None):
+    query = select(*event_columns(fields))
+    if sort_field in EVENT_SORT_COLUMNS:
+        query = query.order_by(EVENT_SORT_COLUMNS[sort_field])
+    return [row._asdict() for row in db.execute(query.offset(skip).limit(limit))]
+
+
+def get_event_rows_by_location(db: Session, location: str, fields: Optional[List[str]] = None):
+    query = select(*event_columns(fields)).filter(models.Event.location == location)
+    return [row._asdict() for row in db.execute(query)]
+
+
+def get_user_event_rows(db: Session, user_id: int, limit: int = 50, after: Optional[Tuple[datetime, int]] = None):
+    """Keyset page of the events a user is subscribed to, ordered by (scheduled_time, id).
+
+    `after` is the (scheduled_time, id) of the last event of the previous page, so every page costs the same
+    no matter how deep into the listing it is.
+    """
+    query = (select(*EVENT_FIELDS.values())
+             .join(models.Subscription, models.Subscription.event_id == models.Event.id)
+             .where(models.Subscription.user_id == user_id))
+    if after is not None:
+        query = query.where(tuple_(models.Event.scheduled_time, models.Event.id) > tuple_(*after))
+    query = query.order_by(models.Event.scheduled_time, models.Event.id).limit(limit)
+    return [row._asdict() for row in db.execute(query)]
 
 
 def get_event_by_id(db: Session, event_id: int):
     return db.query(models.Event).filter(models.Event.id == event_id).first()
 
 
-def update_event(db: Session, event_id: int, event_update: schemas.EventUpdate):
-    db_event = db.query(models.Event).filter(models.Event.id == event_id).first()
-    if db_event:
-        for key, value in event_update.dict(exclude_unset=True).items():
-            setattr(db_event, key, value)
+def update_event(db: Session, event_id: int, event_update: schemas.EventUpdate, expected_version: Optional[int] = None,
+                 commit: bool = True):
+    """Conditional update in a single UPDATE ... RETURNING round trip.
+
+    Returns None when the event does not exist or, if `expected_version` is given, when it was changed
+    by someone else in the meantime.
+    """
+    query = update(models.Event).where(models.Event.id == event_id)
+    if expected_version is not None:
+        query = query.where(models.Event.version == expected_version)
+    values = event_update.dict(exclude_unset=True)
+    if "latitude" in values:
+        values["geohash"] = geo.encode_or_none(values["latitude"], values["longitude"])
+    query = (query.values(**values, version=models.Event.version + 1)
+             .returning(models.Event)
+             .execution_options(populate_existing=True))
+    db_event = db.execute(query).scalars().first()
+    if commit:
         db.commit()
-        db.refresh(db_event)
-        return db_event
-    return None
+    return db_event
 
 
 def delete_event_by_id(db: Session, event_id: int):
@@ -70,14 +132,37 @@ def delete_event_by_id(db: Session, event_id: int):
     return False
 
 
-def get_events_by_location(db: Session, location: str):
-    return db.query(models.Event).filter(models.Event.location == location).all()
+def get_events_by_location(db: Session, location: str, fields: Optional[List[str]] = None):
+    query = db.query(models.Event).options(raiseload("*")).filter(models.Event.location == location)
+    if fields:
+        query = query.options(load_only(*event_columns(fields)))
+    return query.all()
 
 
 def get_subscribers(db: Session, event_id: int):
     return db.query(models.Subscription).filter(models.Subscription.event_id == event_id).all()
 
 
+def get_subscriber_ids(db: Session, event_ids: List[int]) -> Dict[int, List[int]]:
+    subscriber_ids = defaultdict(list)
+    query = (select(models.Subscription.event_id, models.Subscription.user_id)
+             .where(models.Subscription.event_id.in_(event_ids)))
+    for event_id, user_id in db.execute(query):
+        subscriber_ids[event_id].append(user_id)
+    return subscriber_ids
+
+
+def delete_events(db: Session, event_ids: List[int], commit: bool = True) -> int:
+    """Deletes the events and their subscriptions with two statements instead of one per row."""
+    db.execute(delete(models.Subscription).where(models.Subscription.event_id.in_(event_ids))
+               .execution_options(synchronize_session=False))
+    deleted = db.execute(delete(models.Event).where(models.Event.id.in_(event_ids))
+                         .execution_options(synchronize_session=False)).rowcount
+    if commit:
+        db.commit()
+    return deleted
+
+
 def create_subscription(db: Session, subscription: schemas.SubscriptionBase):
     db_subscription = models.Subscription(**subscription.dict())
     db.add(db_subscription)
@@ -96,6 +181,39 @@ def delete_subscription(db: Session, subscription: models.Subscription):
     db.commit()
 
 
+def bulk_create_subscriptions(db: Session, event_ids: List[int], user_ids: List[int]):
+    """Subscribes every user to every event in one statement; returns the (event_id, user_id) pairs inserted.
+
+    Pairs that already exist are skipped by the database through uq_subscription_event_user.
+    """
+    rows = [{"event_id": event_id, "user_id": user_id} for event_id in event_ids for user_id in user_ids]
+    if not rows:
+        return set()
+    statement = (dialect_insert(db, models.Subscription)
+                 .on_conflict_do_nothing(index_elements=["event_id", "user_id"])
+                 .returning(models.Subscription.event_id, models.Subscription.user_id))
+    inserted = {(row.event_id, row.user_id) for row in db.execute(statement, rows)}
+    db.commit()
+    return inserted
+
+
+def bulk_delete_subscriptions(db: Session, event_ids: List[int], user_ids: List[int]):
+    statement = (delete(models.Subscription)
+                 .where(models.Subscription.event_id.in_(event_ids), models.Subscription.user_id.in_(user_ids))
+                 .returning(models.Subscription.event_id, models.Subscription.user_id))
+    deleted = {(row.event_id, row.user_id) for row in db.execute(statement)}
+    db.commit()
+    return deleted
+
+
+def get_existing_event_ids(db: Session, event_ids: List[int]):
+    return set(db.scalars(select(models.Event.id).where(models.Event.id.in_(event_ids))))
+
+
+def get_existing_user_ids(db: Session, user_ids: List[int]):
+    return set(db.scalars(select(models.User.id).where(models.User.id.in_(user_ids))))
+
+
 def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
@@ -105,3 +223,71 @@ def get_upcoming_events(db: Session, time_delta: timedelta):
     end_time = now + time_delta
     return db.query(models.Event).filter(and_(models.Event.scheduled_time >= now,
                                               models.Event.scheduled_time <= end_time)).all()
+
+
+def get_nearby_event_rows(db: Session, latitude: float, longitude: float, radius_km: float, start: datetime,
+                          end: Optional[datetime] = None, limit: int = 100):
+    """Events within `radius_km` scheduled in [start, end], nearest first.
+
+    Only the geohash cells covering the circle are read from the (geohash, scheduled_time) index;
+    exact distances are computed for those candidates alone.
+    """
+    query = select(*event_columns()).where(models.Event.geohash.isnot(None), models.Event.scheduled_time >= start)
+    if end is not None:
+        query = query.where(models.Event.scheduled_time <= end)
+    cells = geo.covering_cells(latitude, longitude, radius_km)
+    if cells is not None:
+        query = query.where(or_(*(
+            models.Event.geohash >= low if high is None else and_(models.Event.geohash >= low, models.Event.geohash < high)
+            for low, high in geo.cell_ranges(cells))))
+    rows = []
+    for row in db.execute(query):
+        distance = geo.haversine_km(latitude, longitude, row.latitude, row.longitude)
+        if distance <= radius_km:
+            rows.append({**row._asdict(), "distance_km": round(distance, 3)})
+    rows.sort(key=lambda row: row["distance_km"])
+    return rows[:limit]
+
+
+def get_event_popularity(db: Session, event_id: int) -> Optional[int]:
+    """Returns None when the event does not exist."""
+    row = db.execute(select(models.Event.popularity).where(models.Event.id == event_id)).first()
+    return None if row is None else row.popularity or 0
+
+
+def get_archived_events(db: Session, skip: int = 0, limit: int = 100):
+    return (db.query(models.ArchivedEvent).order_by(models.ArchivedEvent.scheduled_time.desc())
+            .offset(skip).limit(limit).all())
+
+
+def get_upcoming_event_chunks(db: Session, time_delta: timedelta, chunk_size: int):
+    """Yields the (id, scheduled_time) rows of get_upcoming_events in chunks, paging by keyset."""
+    now = datetime.now(timezone.utc)
+    end_time = now + time_delta
+    after = None
+    while True:
+        query = (select(models.Event.id, models.Event.scheduled_time)
+                 .where(models.Event.scheduled_time >= now, models.Event.scheduled_time <= end_time)
+                 .order_by(models.Event.scheduled_time, models.Event.id)
+                 .limit(chunk_size))
+        if after is not None:
+            query = query.where(tuple_(models.Event.scheduled_time, models.Event.id) > tuple_(*after))
+        chunk = db.execute(query).all()
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        after = (chunk[-1].scheduled_time, chunk[-1].id)
+
+
+def create_job(db: Session, kind: str, username: str, payload: str, total: int):
+    db_job = models.Job(kind=kind, created_by=username, payload=payload, total=total)
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def get_job(db: Session, job_id: int):
+    return db.query(models.Job).filter(models.Job.id == job_id).first()
@@ -0,0 +1,224 @@
+import csv
+import io
+import json
+import queue
+import threading
+from datetime import datetime
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app import crud, geo, models, schemas
+from app.database import SessionLocal
+from app.schemas import DataFormat
+
+IMPORT_COLUMNS = ("description", "location", "scheduled_time", "popularity", "latitude", "longitude", "geohash",
+                  "creation_time", "created_by")
+# empty CSV cells of these columns mean "not set"
+OPTIONAL_COLUMNS = {"latitude", "longitude"}
+EXPORT_COLUMNS = tuple(crud.EVENT_FIELDS)
+CHUNK_ROWS = 1000
+# uploads are spooled to disk past this size before they are imported
+SPOOL_SIZE = 1024 * 1024
+EXPORT_QUEUE_SIZE = 64
+
+MEDIA_TYPES = {
+    DataFormat.csv: "text/csv",
+    DataFormat.ndjson: "application/x-ndjson",
+}
+
+
+class InvalidRow(ValueError):
+    def __init__(self, line: int, error: str):
+        super().__init__(f"line {line}: {error}")
+        self.line = line
+
+
+def read_rows(stream: BinaryIO, fmt: DataFormat) -> Iterator[Tuple[int, dict]]:
+    """Yields (line number, raw row) pairs, reading the stream one line at a time."""
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if fmt == DataFormat.csv:
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {key: None if key in OPTIONAL_COLUMNS and value == "" else value
+                                    for key, value in row.items()}
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            raise InvalidRow(line_number, e.msg)
+
+
+def validated_events(rows: Iterable[Tuple[int, dict]]) -> Iterator[schemas.EventCreate]:
+    for line_number, row in rows:
+        try:
+            yield schemas.EventCreate.model_validate(row)
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+            raise InvalidRow(line_number, errors)
+
+
+class IteratorReader:
+    """Read-only file object over an iterator of strings, as consumed by copy_expert."""
+
+    def __init__(self, chunks: Iterator[str]):
+        self._chunks = chunks
+        self._buffer = ""
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def csv_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def import_events(db: Session, stream: BinaryIO, fmt: DataFormat, username: str) -> int:
+    """Validates and inserts the events of a CSV/NDJSON stream in one transaction; returns how many were imported.
+
+    Rows are validated as they are read, so memory use does not depend on the size of the stream. On Postgres
+    the rows go through COPY FROM STDIN.
+    """
+    now = datetime.now()
+    rows = ((event.description, event.location, event.scheduled_time, event.popularity, event.latitude,
+             event.longitude, geo.encode_or_none(event.latitude, event.longitude), now, username)
+            for event in validated_events(read_rows(stream, fmt)))
+    if db.get_bind().dialect.name == "postgresql":
+        imported = _copy_in(db, rows)
+    else:
+        imported = _insert_chunks(db, rows)
+    db.commit()
+    return imported
+
+
+def _copy_in(db: Session, rows: Iterator[tuple]) -> int:
+    imported = 0
+
+    def counted():
+        nonlocal imported
+        for row in rows:
+            imported += 1
+            yield row
+
+    with db.connection().connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY events ({', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                           IteratorReader(csv_lines(counted())))
+    return imported
+
+
+def _insert_chunks(db: Session, rows: Iterator[tuple]) -> int:
+    imported = 0
+    while chunk := list(islice(rows, CHUNK_ROWS)):
+        db.execute(insert(models.Event), [dict(zip(IMPORT_COLUMNS, row)) for row in chunk])
+        imported += len(chunk)
+    return imported
+
+
+def export_events(fmt: DataFormat, session_factory=SessionLocal) -> Iterator[bytes]:
+    """Streams every event as CSV (with a header) or NDJSON, ordered by id.
+
+    Opens its own session so the stream can outlive the request's session. On Postgres the rows come from
+    COPY TO STDOUT.
+    """
+    db = session_factory()
+    try:
+        postgres = db.get_bind().dialect.name == "postgresql"
+    finally:
+        db.close()
+    if postgres:
+        return _copy_out(_export_sql(fmt), session_factory)
+    return _select_out(fmt, session_factory)
+
+
+def _export_sql(fmt: DataFormat) -> str:
+    query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM events ORDER BY id"
+    if fmt == DataFormat.csv:
+        return f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)"
+    # row_to_json escapes every control character, so with control characters as quote and delimiter
+    # csv format never quotes and each line is exactly one JSON document
+    return (f"COPY (SELECT row_to_json(e) FROM ({query}) e) TO STDOUT "
+            f"WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')")
+
+
+class _CopyCancelled(Exception):
+    pass
+
+
+def _copy_out(sql: str, session_factory) -> Iterator[bytes]:
+    chunks = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+    cancelled = threading.Event()
+
+    def put(item):
+        while not cancelled.is_set():
+            try:
+                chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                pass
+        raise _CopyCancelled()
+
+    class QueueWriter:
+        def write(self, data):
+            put(data.encode() if isinstance(data, str) else data)
+
+    def copy():
+        db = session_factory()
+        try:
+            with db.connection().connection.cursor() as cursor:
+                cursor.copy_expert(sql, QueueWriter())
+            put(None)
+        except _CopyCancelled:
+            pass
+        except Exception as e:
+            try:
+                put(e)
+            except _CopyCancelled:
+                pass
+        finally:
+            db.close()
+
+    # copy_expert pushes rows into a file object, so it runs in a thread feeding a bounded queue
+    threading.Thread(target=copy, name="events-export", daemon=True).start()
+    try:
+        while (chunk := chunks.get()) is not None:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        cancelled.set()
+
+
+def _select_out(fmt: DataFormat, session_factory) -> Iterator[bytes]:
+    db = session_factory()
+    try:
+        result = db.execute(select(*crud.event_columns()).order_by(models.Event.id)
+                            .execution_options(yield_per=CHUNK_ROWS))
+        if fmt == DataFormat.csv:
+            yield "".join(csv_lines([EXPORT_COLUMNS])).encode()
+        for partition in result.partitions():
+            if fmt == DataFormat.csv:
+                yield "".join(csv_lines(partition)).encode()
+            else:
+                yield b"".join(schemas.EventRowAdapter.dump_json(row._asdict()) + b"\n" for row in partition)
+    finally:
+        db.close()
@@ -0,0 +1,100 @@
+import math
+from typing import List, Optional, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+# nearby searches scan at most this many geohash cells; fewer cells means larger, less selective ones
+MAX_CELLS = 32
+
+
+def encode(latitude: float, longitude: float, precision: int = PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def encode_or_none(latitude: Optional[float], longitude: Optional[float]) -> Optional[str]:
+    if latitude is None or longitude is None:
+        return None
+    return encode(latitude, longitude)
+
+
+def cell_size(precision: int):
+    """Returns the (height, width) in degrees of a geohash cell."""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def successor(prefix: str) -> Optional[str]:
+    """Smallest geohash greater than every geohash starting with `prefix`; None if there is none."""
+    while prefix and prefix[-1] == BASE32[-1]:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + BASE32[BASE32.index(prefix[-1]) + 1]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _steps(start: float, end: float, step: float) -> List[float]:
+    values = []
+    while start < end:
+        values.append(start)
+        start += step
+    values.append(end)
+    return values
+
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> Optional[List[str]]:
+    """Geohash prefixes whose cells together cover the circle, using the finest precision that needs at most
+    MAX_CELLS of them. None if the circle covers a pole, where every longitude has to be scanned."""
+    lat_delta = radius_km / KM_PER_DEGREE
+    if abs(latitude) + lat_delta >= 90:
+        return None
+    lon_delta = min(180.0, lat_delta / math.cos(math.radians(abs(latitude) + lat_delta)))
+    south, north = latitude - lat_delta, latitude + lat_delta
+    west, east = longitude - lon_delta, longitude + lon_delta
+    for precision in range(PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        if (math.ceil(2 * lat_delta / height) + 1) * (math.ceil(2 * lon_delta / width) + 1) <= MAX_CELLS:
+            break
+    cells = {
+        # longitudes past the antimeridian wrap around to the other side
+        encode(lat, (lon + 180) % 360 - 180, precision)
+        for lat in _steps(south, north, height)
+        for lon in _steps(west, east, width)
+    }
+    return sorted(cells)
+
+
+def cell_ranges(cells: List[str]) -> List[Tuple[str, Optional[str]]]:
+    """Merges sorted cells into [low, high) geohash ranges, joining cells that are adjacent in geohash order."""
+    ranges = []
+    for cell in cells:
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1] = (ranges[-1][0], successor(cell))
+        else:
+            ranges.append((cell, successor(cell)))
+    return ranges
@@ -0,0 +1,131 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.crud import dialect_insert
+
+
+class IdempotencyConflict(Exception):
+    """A request with the same key is still being processed."""
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a request with a different payload."""
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: int
+    body: bytes
+    expires_at: datetime
+
+
+def make_key(username: str, path: str, idempotency_key: str) -> str:
+    return hashlib.sha256(f"{username}\0{path}\0{idempotency_key}".encode()).hexdigest()
+
+
+def fingerprint(payload: bytes) -> str:
+    return hashlib.sha256(payload).hexdigest()
+
+
+class IdempotencyStore:
+    """Stores the first response for every Idempotency-Key so retries replay it.
+
+    Completed responses are kept in a per-worker LRU in front of the idempotency_keys table,
+    so a retry usually costs a dict lookup and at most one primary key lookup.
+    """
+
+    def __init__(self, ttl: timedelta = timedelta(hours=24), max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            stored = self._cache.get(key)
+            if stored is None:
+                return None
+            if stored.expires_at < datetime.now():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return stored
+
+    def _remember(self, key: str, stored: StoredResponse):
+        with self._lock:
+            self._cache[key] = stored
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _check_fingerprint(stored: StoredResponse, request_fingerprint: str) -> StoredResponse:
+        if stored.fingerprint != request_fingerprint:
+            raise IdempotencyKeyReused()
+        return stored
+
+    def begin(self, db: Session, key: str, request_fingerprint: str) -> Optional[StoredResponse]:
+        """Returns the stored response to replay, or None after reserving the key for this request."""
+        stored = self._cached(key)
+        if stored is not None:
+            return self._check_fingerprint(stored, request_fingerprint)
+
+        now = datetime.now()
+        reserved = db.execute(
+            dialect_insert(db, models.IdempotencyKey)
+            .values(key=key, fingerprint=request_fingerprint, expires_at=now + self.ttl)
+            .on_conflict_do_nothing(index_elements=["key"])
+            .returning(models.IdempotencyKey.key)
+        ).first()
+        db.commit()
+        if reserved is not None:
+            return None
+
+        row = db.execute(select(models.IdempotencyKey).where(models.IdempotencyKey.key == key)).scalar_one()
+        if row.expires_at < now:
+            # expired but not purged yet: start over as if the key was new
+            db.execute(update(models.IdempotencyKey).where(models.IdempotencyKey.key == key)
+                       .values(fingerprint=request_fingerprint, status_code=None, response_body=None,
+                               expires_at=now + self.ttl))
+            db.commit()
+            return None
+        if row.status_code is None:
+            raise IdempotencyConflict()
+        stored = StoredResponse(row.fingerprint, row.status_code, row.response_body, row.expires_at)
+        self._remember(key, stored)
+        return self._check_fingerprint(stored, request_fingerprint)
+
+    def complete(self, db: Session, key: str, request_fingerprint: str, status_code: int, body: bytes):
+        expires_at = datetime.now() + self.ttl
+        db.execute(update(models.IdempotencyKey).where(models.IdempotencyKey.key == key)
+                   .values(status_code=status_code, response_body=body, expires_at=expires_at))
+        db.commit()
+        self._remember(key, StoredResponse(request_fingerprint, status_code, body, expires_at))
+
+    def abandon(self, db: Session, key: str):
+        db.rollback()
+        db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.key == key))
+        db.commit()
+
+    def purge_expired(self, db: Session, batch_size: int = 1000) -> int:
+        purged = 0
+        while True:
+            expired = (select(models.IdempotencyKey.key)
+                       .where(models.IdempotencyKey.expires_at < datetime.now())
+                       .limit(batch_size))
+            deleted = db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.key.in_(expired))
+                                 .execution_options(synchronize_session=False)).rowcount
+            db.commit()
+            purged += deleted
+            if deleted < batch_size:
+                return purged
+
+
+store = IdempotencyStore()
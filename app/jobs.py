@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app import crud, geo, models, notifications, schemas
+from app.database import SessionLocal
+from app.schemas import JobKind, JobStatus
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", 1000))
+# a running job whose progress has not moved for this long belongs to a dead process
+STALE_AFTER = timedelta(minutes=5)
+
+executor = ThreadPoolExecutor(max_workers=int(os.getenv("JOB_WORKERS", 2)), thread_name_prefix="jobs")
+
+
+def create_job(db: Session, kind: JobKind, username: str, payload: dict, total: int) -> models.Job:
+    db_job = crud.create_job(db, kind.value, username, json.dumps(payload), total)
+    submit(db_job.id)
+    return db_job
+
+
+def submit(job_id: int, session_factory=SessionLocal):
+    executor.submit(run_job, job_id, session_factory)
+
+
+def _claim(db: Session, job_id: int) -> bool:
+    claimed = db.execute(update(models.Job)
+                         .where(models.Job.id == job_id, models.Job.status == JobStatus.pending.value)
+                         .values(status=JobStatus.running.value, updated_at=datetime.now())
+                         .execution_options(synchronize_session=False)).rowcount
+    db.commit()
+    return claimed == 1
+
+
+def run_job(job_id: int, session_factory=SessionLocal):
+    db = session_factory()
+    try:
+        if not _claim(db, job_id):
+            return
+        db_job = crud.get_job(db, job_id)
+        payload = json.loads(db_job.payload)
+        process_chunk = CHUNK_PROCESSORS[JobKind(db_job.kind)]
+        while db_job.processed < db_job.total:
+            start = db_job.processed
+            end = min(start + CHUNK_SIZE, db_job.total)
+            changes = process_chunk(db, db_job, payload, start, end)
+            # the chunk's writes and the progress counter commit together
+            db_job.processed = end
+            db_job.updated_at = datetime.now()
+            db.commit()
+            for event_id, change, user_ids in changes:
+                notifications.feed.publish(event_id, change, user_ids)
+        db_job.status = JobStatus.succeeded.value
+        db_job.updated_at = datetime.now()
+        db.commit()
+    except Exception as e:
+        logger.exception(f"Job {job_id} failed")
+        db.rollback()
+        db.execute(update(models.Job).where(models.Job.id == job_id)
+                   .values(status=JobStatus.failed.value, error=str(e), updated_at=datetime.now())
+                   .execution_options(synchronize_session=False))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _create_chunk(db: Session, db_job: models.Job, payload: dict, start: int, end: int):
+    now = datetime.now()
+    events = [schemas.EventCreate(**event) for event in payload["events"][start:end]]
+    db.add_all([
+        models.Event(**event.dict(), geohash=geo.encode_or_none(event.latitude, event.longitude), creation_time=now,
+                     created_by=db_job.created_by)
+        for event in events
+    ])
+    db.flush()
+    return []
+
+
+def _update_chunk(db: Session, db_job: models.Job, payload: dict, start: int, end: int):
+    event_ids: List[int] = payload["event_ids"][start:end]
+    for event_id, event_update in zip(event_ids, payload["updates"][start:end]):
+        if crud.update_event(db, event_id, schemas.EventUpdate(**event_update), commit=False) is None:
+            raise ValueError(f"Event with id {event_id} not found")
+    return [(event_id, "updated", user_ids) for event_id, user_ids in crud.get_subscriber_ids(db, event_ids).items()]
+
+
+def _delete_chunk(db: Session, db_job: models.Job, payload: dict, start: int, end: int):
+    event_ids: List[int] = payload["event_ids"][start:end]
+    subscriber_ids = crud.get_subscriber_ids(db, event_ids)
+    crud.delete_events(db, event_ids, commit=False)
+    return [(event_id, "canceled", user_ids) for event_id, user_ids in subscriber_ids.items()]
+
+
+CHUNK_PROCESSORS = {
+    JobKind.batch_create: _create_chunk,
+    JobKind.batch_update: _update_chunk,
+    JobKind.batch_delete: _delete_chunk,
+}
+
+
+def resume_unfinished_jobs(session_factory=SessionLocal):
+    """Re-queues jobs left behind by a restart; each resumes after its last committed chunk."""
+    db = session_factory()
+    try:
+        db.execute(update(models.Job)
+                   .where(models.Job.status == JobStatus.running.value,
+                          models.Job.updated_at < datetime.now() - STALE_AFTER)
+                   .values(status=JobStatus.pending.value)
+                   .execution_options(synchronize_session=False))
+        db.commit()
+        job_ids = [job_id for job_id, in db.query(models.Job.id).filter(models.Job.status == JobStatus.pending.value)]
+    finally:
+        db.close()
+    for job_id in job_ids:
+        submit(job_id, session_factory)
+    return job_ids
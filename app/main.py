@@ -1,16 +1,24 @@
+import asyncio
+import base64
 import logging
+import os
+import tempfile
 import time
 from datetime import datetime, timezone, timedelta
-from typing import List
+from typing import Callable, Dict, List, Optional
 
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Header
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from starlette import status
-from starlette.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 
-from app import crud, models, schemas, database, auth
+from app import crud, models, schemas, database, auth, metrics, notifications, idempotency, rate_limit, jobs, \
+    event_io, popularity, revocation, scheduler_stats
+from app.query_counter import log_slow_queries
 from app.auth import authenticate_user, create_access_token_for_user, oauth2_scheme, \
     create_access_token
 from app.database import SessionLocal, engine
@@ -26,7 +34,48 @@ models.Base.metadata.create_all(bind=engine)
 
 logger = logging.getLogger(__name__)
 
+metrics.instrument_engine(engine)
+if os.getenv("SLOW_QUERY_THRESHOLD_MS"):
+    log_slow_queries(engine, float(os.getenv("SLOW_QUERY_THRESHOLD_MS")) / 1000)
+
 app = FastAPI()
+app.add_middleware(rate_limit.RateLimitMiddleware, limiter=rate_limit.RateLimiter.from_env())
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+@app.on_event("startup")
+async def start_change_feed():
+    notifications.feed.start(notifications.backend_for(engine), asyncio.get_running_loop())
+
+
+@app.on_event("startup")
+def resume_jobs():
+    jobs.resume_unfinished_jobs()
+
+
+@app.on_event("startup")
+def start_popularity_flush():
+    popularity.buffer.start()
+
+
+@app.on_event("startup")
+def start_revocation_sync():
+    revocation.revocations.start()
+
+
+@app.on_event("shutdown")
+async def stop_change_feed():
+    notifications.feed.stop()
+
+
+@app.on_event("shutdown")
+def flush_popularity():
+    popularity.buffer.stop()
+
+
+@app.on_event("shutdown")
+def stop_revocation_sync():
+    revocation.revocations.stop()
 
 
 @app.get("/docs", include_in_schema=False)
@@ -39,6 +88,84 @@ async def get_openapi_endpoint():
     return app.openapi()
 
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def event_list_response(rows) -> Response:
+    return Response(content=schemas.EventRowList.dump_json(rows), media_type="application/json")
+
+
+FIELDS_QUERY = Query(None, description="comma separated event fields to return, e.g. `id,scheduled_time`. "
+                                       "Returns all fields when omitted")
+
+
+def parse_event_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if fields is None:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in crud.EVENT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown event fields: {', '.join(unknown)}")
+    return names
+
+
+def etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[List[int]]:
+    """Event versions listed in an If-Match header, or None when any version is acceptable."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return [int(tag.strip().removeprefix("W/").strip('"')) for tag in if_match.split(",")]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+
+
+def raise_update_failed(db: Session, event_id: int):
+    if crud.get_event_by_id(db, event_id) is None:
+        raise HTTPException(status_code=404, detail=f"Event with id {event_id} not found")
+    raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED,
+                        detail=f"Event with id {event_id} was modified by someone else")
+
+
+def idempotent_response(db: Session, request: Request, username: str, idempotency_key: Optional[str], payload: bytes,
+                        handler: Callable[[], bytes], status_code: int = 200) -> Response:
+    """Runs `handler` once per Idempotency-Key and replays its stored response on retries."""
+    if idempotency_key is None:
+        return Response(content=handler(), status_code=status_code, media_type="application/json")
+    key = idempotency.make_key(username, request.url.path, idempotency_key)
+    request_fingerprint = idempotency.fingerprint(payload)
+    try:
+        stored = idempotency.store.begin(db, key, request_fingerprint)
+    except idempotency.IdempotencyConflict:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="A request with this Idempotency-Key is still being processed")
+    except idempotency.IdempotencyKeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different payload")
+    if stored is not None:
+        return Response(content=stored.body, status_code=stored.status_code, media_type="application/json",
+                        headers={"Idempotent-Replayed": "true"})
+    try:
+        body = handler()
+    except Exception:
+        idempotency.store.abandon(db, key)
+        raise
+    idempotency.store.complete(db, key, request_fingerprint, status_code, body)
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
+BACKGROUND_QUERY = Query(False, description="run the batch as a background job and return its id right away; "
+                                            "follow its progress at /jobs/{job_id}")
+
+
+def job_accepted(db_job: models.Job) -> bytes:
+    return schemas.JobAccepted(job_id=db_job.id, status_url=f"/jobs/{db_job.id}").model_dump_json().encode()
+
+
 # Create a new user
 @app.post("/users/", response_model=schemas.User, summary="endpoint to create a new user in the app",
           description="create a user by providing a username and password")
@@ -53,56 +180,125 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
     access_token = create_access_token(data={"sub": user.username})
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "refresh_token": auth.create_refresh_token(user.username),
+            "token_type": "bearer"}
+
+
+@app.post("/token/refresh", response_model=schemas.TokenPair, summary="exchange a refresh token for new tokens",
+          description="returns a new access token and a new refresh token without checking the password again. "
+                      "The refresh token sent is revoked, so each one can be used only once")
+def refresh_access_token(request: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    payload = auth.decode_token(request.refresh_token, token_type="refresh")
+    # revoking first means two requests racing with the same refresh token cannot both succeed
+    if payload is None or not auth.revoke_token(db, payload):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    return {"access_token": create_access_token(data={"sub": payload["sub"]}),
+            "refresh_token": auth.create_refresh_token(payload["sub"]), "token_type": "bearer"}
+
+
+@app.post("/token/revoke", summary="log out",
+          description="revokes the access token used for the request and, if given, the refresh token")
+def revoke_tokens(request: schemas.RevokeRequest, db: Session = Depends(get_db),
+                  token: str = Depends(auth.oauth2_scheme)):
+    payload = auth.decode_token(token)
+    if payload is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if request.refresh_token is not None:
+        refresh_payload = auth.decode_token(request.refresh_token, token_type="refresh")
+        if refresh_payload is None or refresh_payload["sub"] != payload["sub"]:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+        auth.revoke_token(db, refresh_payload)
+    auth.revoke_token(db, payload)
+    return {"message": "Tokens revoked successfully"}
 
 
-@app.post("/events/", summary="endpoint to create a new event",
+@app.post("/events/", response_model=schemas.Event, summary="endpoint to create a new event",
           description="create a new event by providing a description of the event, its location, its scheduled time"
-                      " and popularity (number of participants)")
-def create_event(event: schemas.EventCreate, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+                      " and popularity (number of participants). Retries sent with the same Idempotency-Key header "
+                      "get the first response back instead of creating the event again")
+def create_event(event: schemas.EventCreate, request: Request, idempotency_key: Optional[str] = Header(None),
+                 db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
     username = auth.get_user_name_from_token(token)
     if not username:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    return crud.create_event(db=db, event=event, username=username)
+    def create():
+        db_event = crud.create_event(db=db, event=event, username=username)
+        return schemas.Event.model_validate(db_event).model_dump_json().encode()
+
+    return idempotent_response(db, request, username, idempotency_key, event.model_dump_json().encode(), create)
 
 
 @app.get("/events/", response_model=List[schemas.Event], summary="endpoint to view all events listed in the DB")
-def get_events(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+def get_events(fields: Optional[str] = FIELDS_QUERY, db: Session = Depends(get_db),
+               token: str = Depends(oauth2_scheme)):
+    user_id = auth.get_user_name_from_token(token)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    return event_list_response(crud.get_event_rows(db, fields=parse_event_fields(fields)))
+
+
+@app.get("/events/nearby", response_model=List[schemas.NearbyEvent], summary="find events near a location",
+         description="provide coordinates and a radius to get the events within it, nearest first. By default only "
+                     "upcoming events are returned; `start` and `end` limit the scheduled time")
+def get_nearby_events(latitude: float = Query(..., ge=-90, le=90), longitude: float = Query(..., ge=-180, le=180),
+                      radius_km: float = Query(10, gt=0, le=500), start: Optional[datetime] = None,
+                      end: Optional[datetime] = None, limit: int = Query(100, ge=1, le=1000),
+                      db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+    user_id = auth.get_user_name_from_token(token)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    rows = crud.get_nearby_event_rows(db, latitude, longitude, radius_km, start or datetime.now(), end, limit)
+    return Response(content=schemas.NearbyEventRowList.dump_json(rows), media_type="application/json")
+
+
+@app.get("/events/archived", response_model=List[schemas.ArchivedEvent],
+         summary="endpoint to view past events that were moved to the archive",
+         description="events are archived together with their subscriptions once they are scheduled more than "
+                     "ARCHIVE_AFTER_DAYS (30 by default) days ago. Most recent first")
+def get_archived_events(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000),
+                        db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
     user_id = auth.get_user_name_from_token(token)
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    return crud.get_events(db)
+    return crud.get_archived_events(db, skip=skip, limit=limit)
 
 
 @app.get("/event/{id}", response_model=schemas.Event, summary="endpoint to get an event's details",
          description="provide an event's id to get all of it details")
-def get_event_by_description(event_id: int, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+def get_event_by_description(event_id: int, response: Response, db: Session = Depends(get_db),
+                             token: str = Depends(oauth2_scheme)):
     user_id = auth.get_user_name_from_token(token)
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     event = crud.get_event_by_id(db, event_id)
     if event is None:
         raise HTTPException(status_code=404, detail="Event not found")
-
+    response.headers["ETag"] = etag(event.version)
     return event
 
 
 @app.put("/event/{id}", response_model=schemas.Event, summary="endpoint to update an event's details",
          description="provide an event's id to be able to modify its location, description, "
-                     "scheduled time and popularity")
-def update_event(event_id: int, event_update: schemas.EventUpdate, db: Session = Depends(get_db),
+                     "scheduled time and popularity. Send the event's ETag in an If-Match header to only update "
+                     "it if nobody else changed it since you read it")
+def update_event(event_id: int, event_update: schemas.EventUpdate, response: Response,
+                 if_match: Optional[str] = Header(None), db: Session = Depends(get_db),
                  token: str = Depends(auth.oauth2_scheme)):
     user_id = auth.get_user_name_from_token(token)
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    db_event = crud.get_event_by_id(db, event_id)
-    if db_event is None:
-        raise HTTPException(status_code=404, detail="Event not found")
-    updated_event = crud.update_event(db, db_event.id, event_update)
+    versions = parse_if_match(if_match)
+    if versions is not None and len(versions) != 1:
+        raise HTTPException(status_code=400, detail="If-Match must contain a single ETag")
+    updated_event = crud.update_event(db, event_id, event_update, expected_version=versions[0] if versions else None)
+    if updated_event is None:
+        raise_update_failed(db, event_id)
+    response.headers["ETag"] = etag(updated_event.version)
     subscribers = crud.get_subscribers(db, event_id=event_id)
     for subscriber in subscribers:
         logger.info(f"Notification: Event {event_id} has been updated!")
+    notifications.feed.publish(event_id, "updated", notifications.subscriber_user_ids(subscribers))
     return updated_event
 
 
@@ -120,72 +316,109 @@ def delete_event(event_id: int,  db: Session = Depends(get_db), token: str = Dep
     success = crud.delete_event_by_id(db, event_id)
     if not success:
         raise HTTPException(status_code=404, detail="Event not found")
+    notifications.feed.publish(event_id, "canceled", notifications.subscriber_user_ids(subscribers))
     return {"message": "Event deleted successfully"}
 
 
 @app.get("/events/location/{location}", response_model=List[schemas.Event],
          summary="List all events in a given location",
          description="provide a location to get all events from that location")
-def get_events_by_location(location: str, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+def get_events_by_location(location: str, fields: Optional[str] = FIELDS_QUERY, db: Session = Depends(get_db),
+                           token: str = Depends(oauth2_scheme)):
     user_id = auth.get_user_name_from_token(token)
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    events = crud.get_events_by_location(db, location)
-    return events
+    return event_list_response(crud.get_event_rows_by_location(db, location, fields=parse_event_fields(fields)))
 
 
 @app.get("/events/sort/{sort_field}", response_model=List[schemas.Event],
          summary="get all events, sorted by a parameter of your choice",
          description="choose to sort events by scheduled time, popularity or creation time")
-def get_events_sorted(sort_field: SortField, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+def get_events_sorted(sort_field: SortField, fields: Optional[str] = FIELDS_QUERY, db: Session = Depends(get_db),
+                      token: str = Depends(oauth2_scheme)):
     user_id = auth.get_user_name_from_token(token)
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    return crud.get_events(db, sort_field=sort_field)
+    return event_list_response(crud.get_event_rows(db, sort_field=sort_field, fields=parse_event_fields(fields)))
 
 
 @app.post("/events/batch_create/", response_model=List[schemas.Event],
           summary="create multiple events in one request",
           description="provide a description, location, scheduled time and popularity for each event to save "
-                      "them all in the db")
-def batch_create_events(events: List[schemas.EventCreate], db: Session = Depends(get_db), token: str = Depends(auth.oauth2_scheme)):
+                      "them all in the db. Retries sent with the same Idempotency-Key header get the first "
+                      "response back instead of creating the events again")
+def batch_create_events(events: List[schemas.EventCreate], request: Request, background: bool = BACKGROUND_QUERY,
+                        idempotency_key: Optional[str] = Header(None), db: Session = Depends(get_db),
+                        token: str = Depends(auth.oauth2_scheme)):
     username = auth.get_user_name_from_token(token)
     if not username:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    return [crud.create_event(db=db, event=event, username=username) for event in events]
+
+    def create():
+        db_events = [crud.create_event(db=db, event=event, username=username) for event in events]
+        return schemas.EventList.dump_json(schemas.EventList.validate_python(db_events))
+
+    def create_in_background():
+        payload = {"events": [event.model_dump(mode="json") for event in events]}
+        return job_accepted(jobs.create_job(db, schemas.JobKind.batch_create, username, payload, len(events)))
+
+    return idempotent_response(db, request, username, idempotency_key, schemas.EventCreateList.dump_json(events),
+                               create_in_background if background else create,
+                               status_code=status.HTTP_202_ACCEPTED if background else status.HTTP_200_OK)
 
 
 @app.put("/events/batch_update/{event_ids}", summary="update multiple events in one request",
          description="provide the id's of the event you want to update (separated by commas),"
                      " and then update their attributes:"
                      "description, scheduled time, location or popularity for each event to save them all"
-                     " in the DB")
+                     " in the DB. An If-Match header with one ETag per event (in the same order) makes each "
+                     "update conditional on the event not having changed")
 async def batch_update_events(event_ids: str, event_data: List[schemas.EventUpdate],
+                              background: bool = BACKGROUND_QUERY, if_match: Optional[str] = Header(None),
                               db: Session = Depends(get_db), token: str = Depends(auth.oauth2_scheme)):
     username = auth.get_user_name_from_token(token)
     if not username:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     event_id_list = [int(id_) for id_ in event_ids.split(",")]
+    if background:
+        if if_match is not None:
+            raise HTTPException(status_code=400, detail="If-Match is not supported for background jobs")
+        count = min(len(event_id_list), len(event_data))
+        payload = {"event_ids": event_id_list[:count],
+                   "updates": [update.model_dump(mode="json", exclude_unset=True) for update in event_data[:count]]}
+        db_job = jobs.create_job(db, schemas.JobKind.batch_update, username, payload, count)
+        return Response(content=job_accepted(db_job), status_code=status.HTTP_202_ACCEPTED,
+                        media_type="application/json")
+    versions = parse_if_match(if_match)
+    if versions is not None and len(versions) != len(event_id_list):
+        raise HTTPException(status_code=400, detail="If-Match must contain one ETag per event")
     updated_events = []
-    for event_id, new_event_data in zip(event_id_list, event_data):
-        db_event = crud.get_event_by_id(db, event_id)
-        if db_event is None:
-            raise HTTPException(status_code=404, detail=f"Event with id {event_id} not found")
-        updated_event = crud.update_event(db, db_event.id, new_event_data)
+    for index, (event_id, new_event_data) in enumerate(zip(event_id_list, event_data)):
+        updated_event = crud.update_event(db, event_id, new_event_data,
+                                          expected_version=versions[index] if versions else None)
+        if updated_event is None:
+            raise_update_failed(db, event_id)
         subscribers = crud.get_subscribers(db, event_id=event_id)
         for subscriber in subscribers:
             logger.info(f"Notification: Event {event_id} has been updated!")
+        notifications.feed.publish(event_id, "updated", notifications.subscriber_user_ids(subscribers))
         updated_events.append(updated_event)
     return {"message": "Events updated successfully"}
 
 
 @app.delete("/events/batch_delete/{event_ids}", summary="delete multiple events in one request",
             description="provide event ids (separated by commas) to be deleted from the DB")
-def batch_delete_events(event_ids: str, db: Session = Depends(get_db), token: str = Depends(auth.oauth2_scheme)):
+def batch_delete_events(event_ids: str, background: bool = BACKGROUND_QUERY, db: Session = Depends(get_db),
+                        token: str = Depends(auth.oauth2_scheme)):
     username = auth.get_user_name_from_token(token)
     if not username:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     event_id_list = [int(id_) for id_ in event_ids.split(",")]
+    if background:
+        db_job = jobs.create_job(db, schemas.JobKind.batch_delete, username, {"event_ids": event_id_list},
+                                 len(event_id_list))
+        return Response(content=job_accepted(db_job), status_code=status.HTTP_202_ACCEPTED,
+                        media_type="application/json")
     for event_id in event_id_list:
         if not crud.get_event_by_id(db=db, event_id=event_id):
             raise HTTPException(status_code=404, detail="Event not found")
@@ -196,9 +429,112 @@ def batch_delete_events(event_ids: str, db: Session = Depends(get_db), token: st
         for subscription in subscriptions:
             crud.delete_subscription(db, subscription)
         crud.delete_event_by_id(db=db, event_id=event_id)
+        notifications.feed.publish(event_id, "canceled", notifications.subscriber_user_ids(subscribers))
     return {"message": "Events deleted successfully"}
 
 
+@app.post("/events/import", response_model=schemas.ImportResult, summary="import events from a CSV or NDJSON file",
+          description="send the file as the raw request body: CSV with a header row or one JSON object per line, "
+                      "each with a description, location, scheduled time and popularity. Every row is validated "
+                      "and nothing is imported if any row is invalid")
+async def import_events(request: Request, format: schemas.DataFormat = schemas.DataFormat.csv,
+                        db: Session = Depends(get_db), token: str = Depends(auth.oauth2_scheme)):
+    username = auth.get_user_name_from_token(token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    # the import reads a blocking file object, so the body is spooled (to disk once it is large) first
+    with tempfile.SpooledTemporaryFile(max_size=event_io.SPOOL_SIZE) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        try:
+            imported = await run_in_threadpool(event_io.import_events, db, upload, format, username)
+        except event_io.InvalidRow as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail="The file contains an event that already exists")
+    return {"imported": imported}
+
+
+@app.get("/events/export", summary="export all events as CSV or NDJSON",
+         description="streams every event, ordered by id")
+def export_events(format: schemas.DataFormat = schemas.DataFormat.csv, token: str = Depends(auth.oauth2_scheme)):
+    username = auth.get_user_name_from_token(token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    return StreamingResponse(event_io.export_events(format), media_type=event_io.MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="events.{format.value}"'})
+
+
+@app.get("/scheduler/runs", response_model=List[schemas.SchedulerRun], summary="recent scheduler job runs",
+         description="most recent first, with their duration, lag behind schedule and, for the reminder job, how "
+                     "many events were scanned and reminders sent. Runs that were missed or skipped because the "
+                     "previous one was still going are listed too")
+def get_scheduler_runs(job: Optional[str] = None, limit: int = Query(50, ge=1, le=1000), db: Session = Depends(get_db),
+                       token: str = Depends(auth.oauth2_scheme)):
+    username = auth.get_user_name_from_token(token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    return scheduler_stats.get_runs(db, job, limit)
+
+
+@app.get("/scheduler/stats", response_model=Dict[str, schemas.SchedulerJobStats],
+         summary="scheduler job statistics",
+         description="per job summary of its last 100 runs")
+def get_scheduler_stats(db: Session = Depends(get_db), token: str = Depends(auth.oauth2_scheme)):
+    username = auth.get_user_name_from_token(token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    return scheduler_stats.get_stats(db)
+
+
+@app.get("/jobs/{job_id}", response_model=schemas.Job, summary="get the status of a background job",
+         description="provide the id returned by a batch endpoint called with `background=true` to see its "
+                     "status and how many items were processed so far")
+def get_job(job_id: int, db: Session = Depends(get_db), token: str = Depends(auth.oauth2_scheme)):
+    username = auth.get_user_name_from_token(token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    db_job = crud.get_job(db, job_id)
+    if db_job is None or db_job.created_by != username:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return db_job
+
+
+def change_popularity(db: Session, token: str, event_id: int, delta: int):
+    username = auth.get_user_name_from_token(token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    stored = crud.get_event_popularity(db, event_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    popularity.buffer.add(event_id, delta)
+    return {"event_id": event_id, "popularity": stored + popularity.buffer.pending(event_id)}
+
+
+POPULARITY_STEP = Query(1, ge=1, le=1000, description="how much to change the popularity by")
+
+
+@app.post("/events/{event_id}/popularity/increment", response_model=schemas.PopularityChange,
+          summary="increase an event's popularity",
+          description="increments are applied atomically but written to the DB in batches, so listings sorted by "
+                      "popularity catch up within a few seconds")
+def increment_popularity(event_id: int, by: int = POPULARITY_STEP, db: Session = Depends(get_db),
+                         token: str = Depends(auth.oauth2_scheme)):
+    return change_popularity(db, token, event_id, by)
+
+
+@app.post("/events/{event_id}/popularity/decrement", response_model=schemas.PopularityChange,
+          summary="decrease an event's popularity",
+          description="decrements are applied atomically but written to the DB in batches, so listings sorted by "
+                      "popularity catch up within a few seconds")
+def decrement_popularity(event_id: int, by: int = POPULARITY_STEP, db: Session = Depends(get_db),
+                         token: str = Depends(auth.oauth2_scheme)):
+    return change_popularity(db, token, event_id, -by)
+
+
 @app.post("/events/{event_id}/subscribe", response_model=schemas.Subscription,
           summary="subscribe to an event to get notifications about it",
           description="provide an event id to subscribe to it and get notified when it is updated or deleted, "
@@ -211,6 +547,9 @@ def subscribe_to_event(event_id: int, db: Session = Depends(get_db), token: str
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     user = crud.get_user_by_username(db, username=username)
+    subscription = crud.get_subscription(db, event_id=event_id, user_id=user.id)
+    if subscription:
+        return subscription
     subscription_data = schemas.SubscriptionBase(event_id=event_id, user_id=user.id)
     subscription = crud.create_subscription(db=db, subscription=subscription_data)
     return subscription
@@ -230,6 +569,163 @@ def unsubscribe_from_event(event_id: int, db: Session = Depends(get_db), token:
     return subscription
 
 
+def parse_ids(ids: str) -> List[int]:
+    return list(dict.fromkeys(int(id_) for id_ in ids.split(",")))
+
+
+def subscription_results(pairs, changed, changed_status, unchanged_status, missing=(), missing_status=None):
+    results = []
+    for event_id, user_id in pairs:
+        if (event_id, user_id) in missing:
+            status_ = missing_status
+        elif (event_id, user_id) in changed:
+            status_ = changed_status
+        else:
+            status_ = unchanged_status
+        results.append(schemas.SubscriptionResult(event_id=event_id, user_id=user_id, status=status_))
+    return results
+
+
+def get_organized_event(db: Session, event_id: int, username: str) -> models.Event:
+    event = crud.get_event_by_id(db, event_id=event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if event.created_by != username:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only the event organizer can do that")
+    return event
+
+
+@app.post("/events/batch_subscribe/{event_ids}", response_model=List[schemas.SubscriptionResult],
+          summary="subscribe to multiple events in one request",
+          description="provide event ids (separated by commas) to subscribe to all of them. The status of each "
+                      "event is returned; events you are already subscribed to are left as they are")
+def batch_subscribe_to_events(event_ids: str, db: Session = Depends(get_db), token: str = Depends(auth.oauth2_scheme)):
+    username = auth.get_user_name_from_token(token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    user = crud.get_user_by_username(db, username=username)
+    event_id_list = parse_ids(event_ids)
+    found = crud.get_existing_event_ids(db, event_id_list)
+    inserted = crud.bulk_create_subscriptions(db, [event_id for event_id in event_id_list if event_id in found],
+                                              [user.id])
+    pairs = [(event_id, user.id) for event_id in event_id_list]
+    missing = {(event_id, user.id) for event_id in event_id_list if event_id not in found}
+    return subscription_results(pairs, inserted, schemas.SubscriptionStatus.subscribed,
+                                schemas.SubscriptionStatus.already_subscribed,
+                                missing, schemas.SubscriptionStatus.event_not_found)
+
+
+@app.delete("/events/batch_unsubscribe/{event_ids}", response_model=List[schemas.SubscriptionResult],
+            summary="unsubscribe from multiple events in one request",
+            description="provide event ids (separated by commas) to unsubscribe from all of them")
+def batch_unsubscribe_from_events(event_ids: str, db: Session = Depends(get_db),
+                                  token: str = Depends(auth.oauth2_scheme)):
+    username = auth.get_user_name_from_token(token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    user = crud.get_user_by_username(db, username=username)
+    event_id_list = parse_ids(event_ids)
+    deleted = crud.bulk_delete_subscriptions(db, event_id_list, [user.id])
+    return subscription_results([(event_id, user.id) for event_id in event_id_list], deleted,
+                                schemas.SubscriptionStatus.unsubscribed, schemas.SubscriptionStatus.not_subscribed)
+
+
+@app.post("/events/{event_id}/subscribers/{user_ids}", response_model=List[schemas.SubscriptionResult],
+          summary="subscribe multiple users to an event you organize",
+          description="provide the id of an event you created and user ids (separated by commas) to subscribe "
+                      "all of them to it")
+def add_event_subscribers(event_id: int, user_ids: str, db: Session = Depends(get_db),
+                          token: str = Depends(auth.oauth2_scheme)):
+    username = auth.get_user_name_from_token(token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    get_organized_event(db, event_id, username)
+    user_id_list = parse_ids(user_ids)
+    found = crud.get_existing_user_ids(db, user_id_list)
+    inserted = crud.bulk_create_subscriptions(db, [event_id], [user_id for user_id in user_id_list if user_id in found])
+    pairs = [(event_id, user_id) for user_id in user_id_list]
+    missing = {(event_id, user_id) for user_id in user_id_list if user_id not in found}
+    return subscription_results(pairs, inserted, schemas.SubscriptionStatus.subscribed,
+                                schemas.SubscriptionStatus.already_subscribed,
+                                missing, schemas.SubscriptionStatus.user_not_found)
+
+
+@app.delete("/events/{event_id}/subscribers/{user_ids}", response_model=List[schemas.SubscriptionResult],
+            summary="unsubscribe multiple users from an event you organize",
+            description="provide the id of an event you created and user ids (separated by commas) to unsubscribe "
+                        "all of them from it")
+def remove_event_subscribers(event_id: int, user_ids: str, db: Session = Depends(get_db),
+                             token: str = Depends(auth.oauth2_scheme)):
+    username = auth.get_user_name_from_token(token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    get_organized_event(db, event_id, username)
+    user_id_list = parse_ids(user_ids)
+    deleted = crud.bulk_delete_subscriptions(db, [event_id], user_id_list)
+    return subscription_results([(event_id, user_id) for user_id in user_id_list], deleted,
+                                schemas.SubscriptionStatus.unsubscribed, schemas.SubscriptionStatus.not_subscribed)
+
+
+def encode_cursor(row: dict) -> str:
+    raw = f"{row['scheduled_time'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        scheduled_time, event_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(scheduled_time), int(event_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@app.get("/me/events", response_model=schemas.EventPage, summary="list the events you are subscribed to",
+         description="returns the events you are subscribed to ordered by scheduled time, one page at a time. "
+                     "Pass the returned `next_cursor` as `cursor` to get the next page")
+def get_my_events(limit: int = Query(50, ge=1, le=100), cursor: Optional[str] = None, db: Session = Depends(get_db),
+                  token: str = Depends(auth.oauth2_scheme)):
+    username = auth.get_user_name_from_token(token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    user = crud.get_user_by_username(db, username=username)
+    after = decode_cursor(cursor) if cursor else None
+    rows = crud.get_user_event_rows(db, user.id, limit=limit + 1, after=after)
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    page = {"events": rows[:limit], "next_cursor": next_cursor}
+    return Response(content=schemas.EventRowPageAdapter.dump_json(page), media_type="application/json")
+
+
+@app.get("/events/stream", summary="stream changes of the events you are subscribed to",
+         description="server-sent events stream; a message is pushed whenever an event you are subscribed to is "
+                     "updated or canceled")
+async def stream_event_changes(request: Request, token: str = Depends(auth.oauth2_scheme)):
+    username = auth.get_user_name_from_token(token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_username(db, username=username)
+    finally:
+        db.close()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    user_id = user.id
+
+    async def stream():
+        queue = notifications.feed.connect(user_id)
+        try:
+            while not await request.is_disconnected():
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    data = None
+                yield notifications.format_sse(data)
+        finally:
+            notifications.feed.disconnect(user_id, queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint, Index, LargeBinary, Text, \
+    Float
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -13,16 +14,23 @@ class Event(Base):
     id = Column(Integer, primary_key=True, index=True)
     description = Column(String, nullable=False)
     location = Column(String, nullable=False)
-    scheduled_time = Column(DateTime, nullable=False)
+    scheduled_time = Column(DateTime, nullable=False, index=True)
     creation_time = Column(DateTime, default=datetime.now)
     popularity = Column(Integer, default=0)
     created_by = Column(String, ForeignKey('users.username'), nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    latitude = Column(Float)
+    longitude = Column(Float)
+    # geohash of (latitude, longitude); nearby searches scan geohash prefix ranges of this index
+    geohash = Column(String(12))
 
     subscriptions = relationship("Subscription", back_populates="event")
 
     __table_args__ = (
         UniqueConstraint('description', 'location', 'scheduled_time', name='uq_event_details'),
+        Index('ix_events_geohash_scheduled_time', 'geohash', 'scheduled_time'),
     )
+    __mapper_args__ = {'version_id_col': version}
 
 
 class User(Base):
@@ -46,4 +54,95 @@ class Subscription(Base):
     event = relationship("Event", back_populates="subscriptions")
     user = relationship("User", back_populates="subscriptions")
 
+    __table_args__ = (
+        UniqueConstraint('event_id', 'user_id', name='uq_subscription_event_user'),
+        # covers the per-user listing: the user's event ids are read from the index alone
+        Index('ix_subscriptions_user_event', 'user_id', 'event_id'),
+    )
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # sha256 of (username, path, Idempotency-Key header)
+    key = Column(String(64), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    # NULL while the first request is still being processed
+    status_code = Column(Integer)
+    response_body = Column(LargeBinary)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending", index=True)
+    created_by = Column(String, ForeignKey('users.username'), nullable=False)
+    payload = Column(Text, nullable=False)
+    total = Column(Integer, nullable=False)
+    # items done so far; chunks commit together with this counter, so a resumed job continues from here
+    processed = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now)
+
+
+# Past events are moved here by the archive job so the events table only holds recent and upcoming ones
+class ArchivedEvent(Base):
+    __tablename__ = "archived_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String, nullable=False)
+    location = Column(String, nullable=False)
+    scheduled_time = Column(DateTime, nullable=False, index=True)
+    creation_time = Column(DateTime)
+    popularity = Column(Integer)
+    created_by = Column(String, ForeignKey('users.username'), nullable=False)
+    version = Column(Integer, nullable=False)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    geohash = Column(String(12))
+    archived_at = Column(DateTime, nullable=False)
+
+
+class ArchivedSubscription(Base):
+    __tablename__ = "archived_subscriptions"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    event_id = Column(Integer, ForeignKey("archived_events.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    __table_args__ = (
+        Index('ix_archived_subscriptions_user_event', 'user_id', 'event_id'),
+    )
+
 
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    # the token's jti claim; kept until the token would have expired anyway
+    jti = Column(String(32), primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=False, index=True)
+
+
+class SchedulerRun(Base):
+    __tablename__ = "scheduler_runs"
+
+    id = Column(Integer, primary_key=True)
+    job = Column(String, nullable=False)
+    # succeeded, failed, missed (started too late) or skipped (the previous run was still going)
+    status = Column(String, nullable=False)
+    scheduled_at = Column(DateTime, nullable=False, index=True)
+    started_at = Column(DateTime)
+    lag_seconds = Column(Float)
+    duration_seconds = Column(Float)
+    events_scanned = Column(Integer)
+    reminders_sent = Column(Integer)
+    error = Column(Text)
+
+    __table_args__ = (
+        Index('ix_scheduler_runs_job_id', 'job', 'id'),
+    )
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "event_changes"
+# NOTIFY payloads are capped at 8000 bytes, so large subscriber lists are split over several messages
+USER_IDS_PER_MESSAGE = 500
+CLIENT_QUEUE_SIZE = 100
+
+
+class ChangeFeed:
+    """Fans event change messages out to the clients connected to this worker.
+
+    Messages carry the ids of the subscribed users, so delivering one costs a dict lookup per
+    user and never touches the DB, no matter how many clients are connected.
+    """
+
+    def __init__(self):
+        self._clients: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.backend = None
+
+    def start(self, backend, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self.backend = backend
+        backend.start(self)
+
+    def stop(self):
+        if self.backend is not None:
+            self.backend.stop()
+        self.backend = None
+        self._loop = None
+
+    def connect(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self._clients[user_id].add(queue)
+        return queue
+
+    def disconnect(self, user_id: int, queue: asyncio.Queue):
+        queues = self._clients.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._clients[user_id]
+
+    @property
+    def client_count(self) -> int:
+        return sum(len(queues) for queues in self._clients.values())
+
+    def publish(self, event_id: int, change: str, user_ids: Iterable[int]):
+        if self.backend is None:
+            return
+        user_ids = list(user_ids)
+        for i in range(0, len(user_ids), USER_IDS_PER_MESSAGE):
+            message = {"event_id": event_id, "change": change, "user_ids": user_ids[i:i + USER_IDS_PER_MESSAGE]}
+            self.backend.publish(json.dumps(message))
+
+    def receive(self, payload: str):
+        """Entry point for backends; safe to call from any thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.dispatch, payload)
+
+    def dispatch(self, payload: str):
+        message = json.loads(payload)
+        data = json.dumps({"event_id": message["event_id"], "change": message["change"]})
+        for user_id in message["user_ids"]:
+            for queue in self._clients.get(user_id, ()):
+                if queue.full():
+                    # A slow client loses its oldest message instead of growing without bound
+                    queue.get_nowait()
+                queue.put_nowait(data)
+
+
+class InProcessBackend:
+    """Single-process fallback used by tests and non-Postgres deployments."""
+
+    def __init__(self):
+        self.feed: Optional[ChangeFeed] = None
+
+    def start(self, feed: ChangeFeed):
+        self.feed = feed
+
+    def stop(self):
+        self.feed = None
+
+    def publish(self, payload: str):
+        if self.feed is not None:
+            self.feed.receive(payload)
+
+
+class PostgresBackend:
+    """LISTEN/NOTIFY fan-out: each worker holds a single listening connection for all its clients."""
+
+    def __init__(self, engine: Engine, poll_timeout: float = 5.0):
+        self.engine = engine
+        self.poll_timeout = poll_timeout
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, feed: ChangeFeed):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._listen, args=(feed,), name="event-change-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def publish(self, payload: str):
+        with self.engine.connect() as connection:
+            connection.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+            connection.commit()
+
+    def _listen(self, feed: ChangeFeed):
+        while not self._stopped.is_set():
+            try:
+                connection = self.engine.raw_connection()
+                try:
+                    dbapi_connection = connection.dbapi_connection
+                    dbapi_connection.autocommit = True
+                    with dbapi_connection.cursor() as cursor:
+                        cursor.execute(f"LISTEN {CHANNEL}")
+                    while not self._stopped.is_set():
+                        if select.select([dbapi_connection], [], [], self.poll_timeout) == ([], [], []):
+                            continue
+                        dbapi_connection.poll()
+                        while dbapi_connection.notifies:
+                            feed.receive(dbapi_connection.notifies.pop(0).payload)
+                finally:
+                    connection.invalidate()
+            except Exception:
+                logger.exception("Event change listener failed, reconnecting")
+                self._stopped.wait(self.poll_timeout)
+
+
+def backend_for(engine: Engine):
+    if engine.dialect.name == "postgresql":
+        return PostgresBackend(engine)
+    return InProcessBackend()
+
+
+feed = ChangeFeed()
+
+
+def format_sse(data: Optional[str]) -> str:
+    return f"data: {data}\n\n" if data is not None else ": keep-alive\n\n"
+
+
+def subscriber_user_ids(subscriptions) -> List[int]:
+    return [subscription.user_id for subscription in subscriptions]
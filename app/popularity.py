@@ -0,0 +1,96 @@
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# upper bound on how long an increment stays invisible to popularity listings
+FLUSH_INTERVAL = float(os.getenv("POPULARITY_FLUSH_SECONDS", 5))
+
+_events = models.Event.__table__
+_increment = (update(_events)
+              .where(_events.c.id == bindparam("event_id"))
+              .values(popularity=func.coalesce(_events.c.popularity, 0) + bindparam("delta")))
+
+
+class PopularityBuffer:
+    """Accumulates popularity increments per event in this worker and writes them out periodically.
+
+    However many increments a hot event gets between flushes, they reach the DB as a single
+    relative UPDATE, so no increment is lost and the row is locked once per flush. The version is
+    not bumped: increments commute, so they should not fail a concurrent If-Match update.
+    """
+
+    def __init__(self):
+        self._deltas: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, event_id: int, delta: int):
+        with self._lock:
+            self._deltas[event_id] += delta
+
+    def pending(self, event_id: int) -> int:
+        with self._lock:
+            return self._deltas.get(event_id, 0)
+
+    def _drain(self) -> Dict[int, int]:
+        with self._lock:
+            deltas, self._deltas = self._deltas, Counter()
+        return {event_id: delta for event_id, delta in deltas.items() if delta}
+
+    def flush(self, db: Session) -> int:
+        """Writes the buffered deltas in one transaction; returns the number of events updated."""
+        deltas = self._drain()
+        if not deltas:
+            return 0
+        try:
+            # a fixed row order keeps flushes of different workers from deadlocking
+            db.execute(_increment, [{"event_id": event_id, "delta": deltas[event_id]} for event_id in sorted(deltas)])
+            db.commit()
+        except Exception:
+            db.rollback()
+            # keep the deltas for the next flush
+            with self._lock:
+                self._deltas.update(deltas)
+            raise
+        return len(deltas)
+
+    def start(self, session_factory=SessionLocal, interval: float = FLUSH_INTERVAL):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(session_factory, interval),
+                                        name="popularity-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self, session_factory=SessionLocal):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+        db = session_factory()
+        try:
+            self.flush(db)
+        finally:
+            db.close()
+
+    def _run(self, session_factory, interval: float):
+        while not self._stopped.wait(interval):
+            db = session_factory()
+            try:
+                self.flush(db)
+            except Exception:
+                logger.exception("Failed to flush popularity counters")
+            finally:
+                db.close()
+
+
+buffer = PopularityBuffer()
@@ -0,0 +1,103 @@
+import logging
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def explain(conn, statement: str, parameters) -> List[str]:
+    # A fresh DBAPI cursor keeps the pending result of the original statement intact
+    # and bypasses the engine events, so explaining never recurses.
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters or ())
+        return [" ".join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        cursor.close()
+
+
+class QueryCounter:
+    """Counts the statements an engine executes while the context is open.
+
+    On exit it raises QueryBudgetExceeded when more than `max_queries` statements ran, or when
+    one statement was repeated more than `max_repeats` times (the usual N+1 signature).
+    Statements slower than `slow_threshold` seconds are logged with their EXPLAIN output.
+    """
+
+    def __init__(self, engine: Engine, max_queries: Optional[int] = None, max_repeats: Optional[int] = None,
+                 slow_threshold: Optional[float] = None):
+        self.engine = engine
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.slow_threshold = slow_threshold
+        self.statements: List[str] = []
+        self.slow_queries: List[Tuple[str, float, List[str]]] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, min_repeats: int = 2) -> List[Tuple[str, int]]:
+        return [(statement, times) for statement, times in Counter(self.statements).most_common()
+                if times >= min_repeats]
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_counter_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_counter_start"].pop()
+        self.statements.append(statement)
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            plan = explain(conn, statement, parameters) if not executemany else []
+            self.slow_queries.append((statement, elapsed, plan))
+            logger.warning("Slow query (%.1f ms): %s\n%s", elapsed * 1000, statement, "\n".join(plan))
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(self.engine, "after_cursor_execute", self._after_cursor_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(self.engine, "after_cursor_execute", self._after_cursor_execute)
+        if exc_type is None:
+            self.check()
+        return False
+
+    def check(self):
+        if self.max_queries is not None and self.count > self.max_queries:
+            raise QueryBudgetExceeded(f"Expected at most {self.max_queries} queries, got {self.count}:\n"
+                                      + "\n".join(self.statements))
+        if self.max_repeats is not None:
+            repeated = self.repeated(self.max_repeats + 1)
+            if repeated:
+                statement, times = repeated[0]
+                raise QueryBudgetExceeded(f"Statement executed {times} times (max {self.max_repeats}), "
+                                          f"possible N+1:\n{statement}")
+
+
+def log_slow_queries(engine: Engine, threshold: float):
+    """Always-on slow query logging for staging, without the counting overhead."""
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["slow_query_start"].pop()
+        if elapsed >= threshold:
+            plan = explain(conn, statement, parameters) if not executemany else []
+            logger.warning("Slow query (%.1f ms): %s\n%s", elapsed * 1000, statement, "\n".join(plan))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
@@ -0,0 +1,150 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from app import auth
+
+EXEMPT_PATHS = {"/metrics", "/docs", "/openapi.json"}
+BULK_PATHS = {"/events/import", "/events/export"}
+
+
+class Limit(NamedTuple):
+    rate: float  # tokens added per second
+    burst: float  # bucket capacity
+
+
+DEFAULT_LIMITS = {
+    "read": Limit(rate=20, burst=40),
+    "write": Limit(rate=5, burst=10),
+    "batch": Limit(rate=0.5, burst=2),
+    "login": Limit(rate=0.2, burst=5),
+}
+
+# Caps shared by all clients of a worker, e.g. to bound the argon2 work /token can cause
+DEFAULT_GLOBAL_LIMITS = {
+    "login": Limit(rate=20, burst=40),
+}
+
+
+def route_class(method: str, path: str) -> str:
+    if path == "/token":
+        return "login"
+    if "batch" in path or path in BULK_PATHS:
+        return "batch"
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "read"
+    return "write"
+
+
+class RateLimitBackend:
+    """Storage for token buckets.
+
+    The in-memory backend limits per worker; a shared backend (e.g. Redis running the same refill
+    arithmetic in a script) can be plugged in to enforce limits across workers.
+    """
+
+    def take(self, key: str, limit: Limit, now: float) -> Tuple[bool, float]:
+        """Takes one token; returns whether it was available and else the seconds until it will be."""
+        raise NotImplementedError
+
+
+class InMemoryBackend(RateLimitBackend):
+    def __init__(self, max_buckets: int = 100_000):
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, now: float) -> Tuple[bool, float]:
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (limit.burst, now))
+            tokens = min(limit.burst, tokens + (now - updated_at) * limit.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_buckets:
+                # the least recently seen bucket has had the longest time to refill anyway
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / limit.rate
+
+
+def parse_limit(value: str) -> Limit:
+    rate, burst = value.split(",")
+    return Limit(rate=float(rate), burst=float(burst))
+
+
+class RateLimiter:
+    def __init__(self, limits: Dict[str, Limit] = None, global_limits: Dict[str, Limit] = None,
+                 backend: Optional[RateLimitBackend] = None):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.global_limits = dict(DEFAULT_GLOBAL_LIMITS if global_limits is None else global_limits)
+        self.backend = backend or InMemoryBackend()
+
+    @classmethod
+    def from_env(cls, backend: Optional[RateLimitBackend] = None) -> "RateLimiter":
+        """Limits can be overridden as RATE_LIMIT_<CLASS>="<per second>,<burst>", e.g. RATE_LIMIT_LOGIN="0.1,3"."""
+        limits = dict(DEFAULT_LIMITS)
+        global_limits = dict(DEFAULT_GLOBAL_LIMITS)
+        for name in DEFAULT_LIMITS:
+            if os.getenv(f"RATE_LIMIT_{name.upper()}"):
+                limits[name] = parse_limit(os.getenv(f"RATE_LIMIT_{name.upper()}"))
+            if os.getenv(f"GLOBAL_RATE_LIMIT_{name.upper()}"):
+                global_limits[name] = parse_limit(os.getenv(f"GLOBAL_RATE_LIMIT_{name.upper()}"))
+        return cls(limits, global_limits, backend)
+
+    def check(self, route: str, client: str, now: Optional[float] = None) -> Tuple[bool, float]:
+        now = time.monotonic() if now is None else now
+        global_limit = self.global_limits.get(route)
+        if global_limit is not None:
+            allowed, retry_after = self.backend.take(f"global:{route}", global_limit, now)
+            if not allowed:
+                return allowed, retry_after
+        limit = self.limits.get(route)
+        if limit is None:
+            return True, 0.0
+        return self.backend.take(f"{route}:{client}", limit, now)
+
+
+def client_key(scope, route: str) -> str:
+    if route != "login":
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                username = auth.get_user_name_from_token(token) if scheme.lower() == "bearer" else None
+                if username:
+                    return f"user:{username}"
+                break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        route = route_class(scope["method"], scope["path"])
+        allowed, retry_after = self.limiter.check(route, client_key(scope, route))
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,138 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import SessionLocal, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_SECONDS", 5))
+# revocations are read again for this long, so rows committed out of order or by a worker with a
+# skewed clock are not missed
+SYNC_OVERLAP = timedelta(seconds=30)
+# a bloom filter cannot forget, so it is rebuilt from the unexpired revocations this often
+RELOAD_INTERVAL = timedelta(hours=1)
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+
+class RevocationList:
+    """Revoked token ids, checked without a DB hit for tokens that were never revoked.
+
+    Every worker keeps a bloom filter of the revoked_tokens table and polls it for revocations
+    made by other workers. Only a bloom filter hit, i.e. a revoked token or a rare false
+    positive, is confirmed against the DB.
+    """
+
+    def __init__(self, capacity: int = int(os.getenv("REVOCATION_CAPACITY", 100_000)),
+                 session_factory=SessionLocal):
+        self.capacity = capacity
+        self.session_factory = session_factory
+        self._bloom = BloomFilter(capacity)
+        self._synced_at: Optional[datetime] = None
+        self._reloaded_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def is_revoked(self, jti: str) -> bool:
+        if jti not in self._bloom:
+            return False
+        db = self.session_factory()
+        try:
+            return db.get(models.RevokedToken, jti) is not None
+        finally:
+            db.close()
+
+    def revoke(self, db: Session, jti: str, expires_at: datetime) -> bool:
+        """Returns False if the token was already revoked."""
+        revoked = db.execute(dialect_insert(db, models.RevokedToken)
+                             .values(jti=jti, expires_at=expires_at, revoked_at=datetime.now())
+                             .on_conflict_do_nothing(index_elements=["jti"])
+                             .returning(models.RevokedToken.jti)).first()
+        db.commit()
+        with self._lock:
+            self._bloom.add(jti)
+        return revoked is not None
+
+    def reload(self, db: Session):
+        now = datetime.now()
+        bloom = BloomFilter(self.capacity)
+        jtis = db.scalars(select(models.RevokedToken.jti).where(models.RevokedToken.expires_at > now))
+        for jti in jtis:
+            bloom.add(jti)
+        with self._lock:
+            self._bloom = bloom
+            self._synced_at = self._reloaded_at = now
+
+    def sync(self, db: Session):
+        if self._reloaded_at is None or datetime.now() - self._reloaded_at > RELOAD_INTERVAL:
+            self.reload(db)
+            return
+        now = datetime.now()
+        jtis = db.scalars(select(models.RevokedToken.jti)
+                          .where(models.RevokedToken.revoked_at >= self._synced_at - SYNC_OVERLAP)).all()
+        with self._lock:
+            for jti in jtis:
+                self._bloom.add(jti)
+            self._synced_at = now
+
+    def purge_expired(self, db: Session) -> int:
+        purged = db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at < datetime.now())
+                            .execution_options(synchronize_session=False)).rowcount
+        db.commit()
+        return purged
+
+    def start(self, interval: float = SYNC_INTERVAL):
+        db = self.session_factory()
+        try:
+            self.reload(db)
+        finally:
+            db.close()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="revocation-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float):
+        while not self._stopped.wait(interval):
+            db = self.session_factory()
+            try:
+                self.sync(db)
+            except Exception:
+                logger.exception("Failed to sync revoked tokens")
+            finally:
+                db.close()
+
+
+revocations = RevocationList()
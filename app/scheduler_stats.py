@@ -0,0 +1,134 @@
+import logging
+import math
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app import metrics, models
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+RECORDED_EVENTS = EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES
+RUN_STATUSES = {
+    EVENT_JOB_EXECUTED: "succeeded",
+    EVENT_JOB_ERROR: "failed",
+    # the run started too late, after misfire_grace_time
+    EVENT_JOB_MISSED: "missed",
+    # the previous run was still going
+    EVENT_JOB_MAX_INSTANCES: "skipped",
+}
+KEEP_RUNS_FOR = timedelta(days=7)
+# /scheduler/stats summarizes this many recent runs per job
+STATS_WINDOW = 100
+
+
+class RunStats:
+    __slots__ = ("started_at", "duration_seconds", "events_scanned", "reminders_sent")
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.duration_seconds = None
+        self.events_scanned = None
+        self.reminders_sent = None
+
+
+@contextmanager
+def track_run(job_name: str):
+    """Measures a job run; the job returns the yielded stats so the run listener can record them."""
+    stats = RunStats()
+    start = time.perf_counter()
+    try:
+        with metrics.track_job(job_name):
+            yield stats
+    finally:
+        stats.duration_seconds = time.perf_counter() - start
+
+
+def _local(moment: datetime) -> datetime:
+    return moment.astimezone().replace(tzinfo=None)
+
+
+def record_run(job_event, session_factory=SessionLocal):
+    """APScheduler listener for executed, failed, missed and skipped runs."""
+    status = RUN_STATUSES[job_event.code]
+    scheduled_times = getattr(job_event, "scheduled_run_times", None) or [job_event.scheduled_run_time]
+    scheduled_at = _local(max(scheduled_times))
+    stats = getattr(job_event, "retval", None)
+    if not isinstance(stats, RunStats):
+        stats = None
+    exception = getattr(job_event, "exception", None)
+    run = models.SchedulerRun(
+        job=job_event.job_id,
+        status=status,
+        scheduled_at=scheduled_at,
+        started_at=stats.started_at if stats else None,
+        lag_seconds=(stats.started_at - scheduled_at).total_seconds() if stats else None,
+        duration_seconds=stats.duration_seconds if stats else None,
+        events_scanned=stats.events_scanned if stats else None,
+        reminders_sent=stats.reminders_sent if stats else None,
+        error=repr(exception) if exception else None,
+    )
+    if status in ("missed", "skipped"):
+        logger.warning(f"Job {run.job} run scheduled at {scheduled_at} was {status}")
+    elif stats:
+        logger.info(f"Job {run.job} {status} in {run.duration_seconds:.3f}s, {run.lag_seconds:.3f}s late, "
+                    f"events scanned: {run.events_scanned}, reminders sent: {run.reminders_sent}")
+    db = session_factory()
+    try:
+        db.add(run)
+        db.commit()
+    except Exception:
+        logger.exception(f"Failed to record run of job {run.job}")
+    finally:
+        db.close()
+
+
+def get_runs(db: Session, job: Optional[str] = None, limit: int = 50) -> List[models.SchedulerRun]:
+    query = select(models.SchedulerRun).order_by(models.SchedulerRun.id.desc()).limit(limit)
+    if job is not None:
+        query = query.where(models.SchedulerRun.job == job)
+    return db.scalars(query).all()
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarize(runs: List[models.SchedulerRun]) -> Dict:
+    durations = [run.duration_seconds for run in runs if run.duration_seconds is not None]
+    lags = [run.lag_seconds for run in runs if run.lag_seconds is not None]
+    scanned = [run.events_scanned for run in runs if run.events_scanned is not None]
+    sent = [run.reminders_sent for run in runs if run.reminders_sent is not None]
+    return {
+        "runs": len(runs),
+        **{status: sum(run.status == status for run in runs) for status in RUN_STATUSES.values()},
+        "duration_p50_seconds": _percentile(durations, 0.5),
+        "duration_p95_seconds": _percentile(durations, 0.95),
+        "duration_max_seconds": max(durations, default=None),
+        "lag_p95_seconds": _percentile(lags, 0.95),
+        "lag_max_seconds": max(lags, default=None),
+        "events_scanned_max": max(scanned, default=None),
+        "reminders_sent_max": max(sent, default=None),
+    }
+
+
+def get_stats(db: Session, window: int = STATS_WINDOW) -> Dict[str, Dict]:
+    jobs = db.scalars(select(models.SchedulerRun.job).distinct()).all()
+    return {job: summarize(get_runs(db, job, window)) for job in sorted(jobs)}
+
+
+def purge_old_runs(db: Session) -> int:
+    purged = db.execute(delete(models.SchedulerRun)
+                        .where(models.SchedulerRun.scheduled_at < datetime.now() - KEEP_RUNS_FOR)
+                        .execution_options(synchronize_session=False)).rowcount
+    db.commit()
+    return purged
@@ -1,7 +1,8 @@
 from typing import Optional, List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, model_validator
 from datetime import datetime
+from typing_extensions import TypedDict
 
 from enum import Enum
 
@@ -11,6 +12,14 @@ class EventBase(BaseModel):
     location: str
     scheduled_time: datetime
     popularity: int
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    @model_validator(mode="after")
+    def check_coordinates(self):
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude and longitude must be given together")
+        return self
 
 
 class EventCreate(EventBase):
@@ -18,10 +27,63 @@ class EventCreate(EventBase):
 
 
 class Event(EventBase):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     creation_time: datetime
     popularity: int
     created_by: str
+    version: int
+
+
+EventList = TypeAdapter(List[Event])
+EventCreateList = TypeAdapter(List[EventCreate])
+
+
+class ArchivedEvent(Event):
+    archived_at: datetime
+
+
+class NearbyEvent(Event):
+    distance_km: float
+
+
+# Plain row shape of Event used by the list endpoints: rows are already typed by the DB,
+# so they are serialized straight to JSON bytes without building models or validating.
+# total=False because a `fields=` projection may select only some of the columns.
+class EventRow(TypedDict, total=False):
+    description: str
+    location: str
+    scheduled_time: datetime
+    popularity: int
+    latitude: Optional[float]
+    longitude: Optional[float]
+    id: int
+    creation_time: datetime
+    created_by: str
+    version: int
+
+
+class NearbyEventRow(EventRow, total=False):
+    distance_km: float
+
+
+EventRowAdapter = TypeAdapter(EventRow)
+EventRowList = TypeAdapter(List[EventRow])
+NearbyEventRowList = TypeAdapter(List[NearbyEventRow])
+
+
+class EventPage(BaseModel):
+    events: List[Event]
+    next_cursor: Optional[str] = None
+
+
+class EventRowPage(TypedDict):
+    events: List[EventRow]
+    next_cursor: Optional[str]
+
+
+EventRowPageAdapter = TypeAdapter(EventRowPage)
 
 
 class EventUpdate(BaseModel):
@@ -29,6 +91,15 @@ class EventUpdate(BaseModel):
     location: Optional[str] = None
     scheduled_time: Optional[datetime] = None
     popularity: Optional[int] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    @model_validator(mode="after")
+    def check_coordinates(self):
+        if ("latitude" in self.model_fields_set) != ("longitude" in self.model_fields_set) or \
+                (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude and longitude must be updated together")
+        return self
 
 
 class UserBase(BaseModel):
@@ -47,6 +118,8 @@ class UserCreate(UserBase):
 
 
 class User(UserBase):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     creation_time: datetime
 
@@ -71,7 +144,107 @@ class SubscriptionCreate(SubscriptionBase):
 
 
 class Subscription(SubscriptionBase):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
 
 
+class SubscriptionStatus(str, Enum):
+    subscribed = "subscribed"
+    already_subscribed = "already_subscribed"
+    unsubscribed = "unsubscribed"
+    not_subscribed = "not_subscribed"
+    event_not_found = "event_not_found"
+    user_not_found = "user_not_found"
 
+
+class SubscriptionResult(SubscriptionBase):
+    status: SubscriptionStatus
+
+
+class JobStatus(str, Enum):
+    pending = "pending"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+class JobKind(str, Enum):
+    batch_create = "batch_create"
+    batch_update = "batch_update"
+    batch_delete = "batch_delete"
+
+
+class Job(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    kind: JobKind
+    status: JobStatus
+    total: int
+    processed: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class JobAccepted(BaseModel):
+    job_id: int
+    status_url: str
+
+
+class DataFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+
+class ImportResult(BaseModel):
+    imported: int
+
+
+class PopularityChange(BaseModel):
+    event_id: int
+    # includes the changes of this worker that were not written to the DB yet
+    popularity: int
+
+
+class TokenPair(Token):
+    refresh_token: str
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class RevokeRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+
+class SchedulerRun(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    job: str
+    status: str
+    scheduled_at: datetime
+    started_at: Optional[datetime] = None
+    lag_seconds: Optional[float] = None
+    duration_seconds: Optional[float] = None
+    events_scanned: Optional[int] = None
+    reminders_sent: Optional[int] = None
+    error: Optional[str] = None
+
+
+class SchedulerJobStats(BaseModel):
+    runs: int
+    succeeded: int
+    failed: int
+    missed: int
+    skipped: int
+    duration_p50_seconds: Optional[float] = None
+    duration_p95_seconds: Optional[float] = None
+    duration_max_seconds: Optional[float] = None
+    lag_p95_seconds: Optional[float] = None
+    lag_max_seconds: Optional[float] = None
+    events_scanned_max: Optional[int] = None
+    reminders_sent_max: Optional[int] = None
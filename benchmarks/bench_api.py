@@ -0,0 +1,224 @@
+"""Benchmark harness for the scheduler API.
+
+Seeds a database with configurable volumes, drives every endpoint in app/main.py in-process through
+TestClient and writes throughput and latency percentiles as JSON.
+
+    python -m benchmarks.bench_api --database-url sqlite:///bench.db --events 10000 --output results.json
+    python -m benchmarks.bench_api --output new.json --compare results.json --tolerance 0.2
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float], items_per_sample: int = 1) -> Dict[str, float]:
+    total = sum(samples)
+    return {
+        "samples": len(samples),
+        "items_per_sample": items_per_sample,
+        "throughput_per_s": round(len(samples) * items_per_sample / total, 2) if total else None,
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def measure(fn: Callable[[int], object], iterations: int) -> List[float]:
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def check(response, expected=200):
+    if response.status_code != expected:
+        raise RuntimeError(f"{response.request.method} {response.request.url} -> {response.status_code}: "
+                           f"{response.text[:200]}")
+    return response
+
+
+def seed(session_factory, models, password_hash, users: int, events: int, subscriptions: int, run_id: str):
+    from sqlalchemy import insert, select
+
+    now = datetime.now()
+    with session_factory() as db:
+        db.execute(insert(models.User), [
+            {"username": f"bench_{run_id}_{i}", "password_hash": password_hash, "creation_time": now}
+            for i in range(users)
+        ])
+        db.execute(insert(models.Event), [
+            {"description": f"bench {run_id} {i}", "location": f"location {i % 50}",
+             "scheduled_time": now + timedelta(minutes=i % 20_000), "creation_time": now,
+             "popularity": i % 1000, "created_by": f"bench_{run_id}_{i % users}"}
+            for i in range(events)
+        ])
+        db.commit()
+        user_ids = db.scalars(select(models.User.id).where(models.User.username.like(f"bench_{run_id}_%"))).all()
+        event_ids = db.scalars(select(models.Event.id).where(
+            models.Event.description.like(f"bench {run_id} %"))).all()
+        rng = random.Random(run_id)
+        db.execute(insert(models.Subscription), [
+            {"event_id": rng.choice(event_ids), "user_id": rng.choice(user_ids)} for _ in range(subscriptions)
+        ])
+        db.commit()
+    return list(event_ids)
+
+
+def event_payload(run_id: str, tag: str, i: int) -> dict:
+    return {"description": f"bench {run_id} {tag} {i}", "location": f"location {i % 50}",
+            "scheduled_time": (datetime.now() + timedelta(days=1, seconds=i)).isoformat(), "popularity": i % 100}
+
+
+def run(args) -> dict:
+    os.environ["DATABASE_URL"] = args.database_url
+    # measure the endpoints themselves, not the rate limiter's 429s
+    for route in ("READ", "WRITE", "BATCH", "LOGIN"):
+        os.environ[f"RATE_LIMIT_{route}"] = os.environ[f"GLOBAL_RATE_LIMIT_{route}"] = "1e9,1e9"
+    from fastapi.testclient import TestClient
+
+    from app import auth, background_tasks, models
+    from app.database import SessionLocal
+    from app.main import app
+
+    background_tasks.scheduler.pause()
+    logging.getLogger("app").setLevel(logging.WARNING)
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+    password = "bench-password"
+    event_ids = seed(SessionLocal, models, auth.get_password_hash(password), args.users, args.events,
+                     args.subscriptions, run_id)
+    client = TestClient(app)
+    username = f"bench_{run_id}_0"
+    results = {}
+
+    login = {"username": username, "password": password}
+    results["POST /token"] = summarize(measure(lambda i: check(client.post("/token", data=login)),
+                                               args.login_iterations))
+    token = client.post("/token", data=login).json()["access_token"]
+    client.headers["Authorization"] = f"Bearer {token}"
+
+    n = args.iterations
+    pick = random.Random(run_id).choice
+    created_ids = []
+
+    def create_single(i):
+        created_ids.append(check(client.post("/events/", json=event_payload(run_id, "single", i))).json()["id"])
+
+    endpoints = {
+        "GET /events/": lambda i: check(client.get("/events/")),
+        "GET /event/{id}": lambda i: check(client.get(f"/event/{{id}}", params={"event_id": pick(event_ids)})),
+        "GET /events/location/{location}": lambda i: check(client.get(f"/events/location/location {i % 50}")),
+        "GET /events/sort/{sort_field}": lambda i: check(
+            client.get(f"/events/sort/{('scheduled_time', 'popularity', 'creation_time')[i % 3]}")),
+        "POST /events/": create_single,
+        "PUT /event/{id}": lambda i: check(client.put("/event/{id}", params={"event_id": pick(event_ids)},
+                                                      json={"popularity": i})),
+        "POST /events/{event_id}/subscribe": lambda i: check(client.post(f"/events/{event_ids[i]}/subscribe")),
+        "DELETE /events/{event_id}/unsubscribe": lambda i: check(
+            client.delete(f"/events/{event_ids[i]}/unsubscribe")),
+    }
+    for name, fn in endpoints.items():
+        results[name] = summarize(measure(fn, n))
+
+    for size in args.batch_sizes:
+        payload = [event_payload(run_id, f"batch{size}", i) for i in range(size)]
+        start = time.perf_counter()
+        created = check(client.post("/events/batch_create/", json=payload)).json()
+        results[f"POST /events/batch_create/ [{size}]"] = summarize([time.perf_counter() - start], size)
+        ids = ",".join(str(event["id"]) for event in created)
+
+        start = time.perf_counter()
+        check(client.put(f"/events/batch_update/{ids}", json=[{"popularity": 1}] * size))
+        results[f"PUT /events/batch_update/ [{size}]"] = summarize([time.perf_counter() - start], size)
+
+        start = time.perf_counter()
+        check(client.delete(f"/events/batch_delete/{ids}"))
+        results[f"DELETE /events/batch_delete/ [{size}]"] = summarize([time.perf_counter() - start], size)
+
+    # Events created above have no subscribers, so this measures the delete itself.
+    results["DELETE /event/{id}"] = summarize(measure(
+        lambda i: check(client.delete("/event/{id}", params={"event_id": created_ids[i]})), len(created_ids)))
+
+    def reminder_tick(i):
+        with SessionLocal() as db:
+            background_tasks.send_reminder(db, timedelta(minutes=args.reminder_window))
+
+    results["reminder tick"] = summarize(measure(reminder_tick, args.reminder_iterations))
+
+    return {
+        "meta": {
+            "run_id": run_id,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "database": args.database_url.split("://")[0],
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "events": args.events,
+            "subscriptions": args.subscriptions,
+            "iterations": args.iterations,
+            "batch_sizes": args.batch_sizes,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if previous and result["p50_ms"] > previous["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {previous['p50_ms']}ms -> {result['p50_ms']}ms")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///bench.db")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--subscriptions", type=int, default=20_000)
+    parser.add_argument("--iterations", type=int, default=200, help="requests per single-item endpoint")
+    parser.add_argument("--login-iterations", type=int, default=20)
+    parser.add_argument("--reminder-iterations", type=int, default=5)
+    parser.add_argument("--reminder-window", type=int, default=30, help="reminder window in minutes")
+    parser.add_argument("--batch-sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        default=[1000], help="comma separated, e.g. 1000,10000,100000")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="baseline JSON file to compare p50 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown before failing")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for name, result in report["results"].items():
+        print(f"{name:45} {result['throughput_per_s']:>10}/s  p50 {result['p50_ms']:>9}ms  p99 {result['p99_ms']:>9}ms")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
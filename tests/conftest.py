@@ -0,0 +1,34 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.query_counter import QueryCounter
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def count_queries(engine):
+    """Usage: `with count_queries(max_queries=2, max_repeats=1): ...`"""
+
+    def factory(max_queries=None, max_repeats=None, slow_threshold=None):
+        return QueryCounter(engine, max_queries=max_queries, max_repeats=max_repeats, slow_threshold=slow_threshold)
+
+    return factory
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from app import archive, crud, models
+
+
+def _seed(db):
+    db.add_all([models.User(id=1, username="owner", password_hash="x"),
+                models.User(id=2, username="other", password_hash="x")])
+    now = datetime.now()
+    db.add_all([
+        models.Event(id=i, description=f"event {i}", location="Tel Aviv", scheduled_time=now + timedelta(days=days),
+                     popularity=i, created_by="owner")
+        for i, days in enumerate([-90, -60, -40, 1, 10], start=1)
+    ])
+    db.commit()
+    crud.bulk_create_subscriptions(db, [1, 2, 4], [1, 2])
+
+
+def test_archives_past_events_with_subscriptions(db):
+    _seed(db)
+
+    assert archive.archive_events_before(db, datetime.now() - timedelta(days=30), batch_size=2) == 3
+
+    assert [event.id for event in db.query(models.Event).order_by(models.Event.id)] == [4, 5]
+    assert [(s.event_id, s.user_id) for s in db.query(models.Subscription)] == [(4, 1), (4, 2)]
+    archived = crud.get_archived_events(db)
+    assert [event.id for event in archived] == [3, 2, 1]
+    assert archived[0].version == 1
+    assert sorted((s.event_id, s.user_id) for s in db.query(models.ArchivedSubscription)) == \
+        [(1, 1), (1, 2), (2, 1), (2, 2)]
+
+
+def test_nothing_to_archive(db, count_queries):
+    _seed(db)
+
+    with count_queries(max_queries=1):
+        assert archive.archive_events_before(db, datetime.now() - timedelta(days=365)) == 0
@@ -66,3 +66,39 @@ def test_get_user_name_from_token(mock_jwt_decode):
     mock_jwt_decode.return_value = {"sub": "test_user", "exp": datetime.now().timestamp() + 3600}
     assert auth.get_user_name_from_token("valid_token") == "test_user"
 
+
+
+def test_token_carries_kid_and_jti():
+    token = auth.create_access_token({"sub": "test_user"})
+
+    assert jwt.get_unverified_header(token)["kid"] == auth.ACTIVE_KID
+    assert auth.decode_token(token)["jti"] != auth.decode_token(auth.create_access_token({"sub": "test_user"}))["jti"]
+
+
+def test_refresh_token_is_not_an_access_token():
+    refresh_token = auth.create_refresh_token("test_user")
+
+    assert auth.get_user_name_from_token(refresh_token) is None
+    assert auth.decode_token(refresh_token, token_type="refresh")["sub"] == "test_user"
+
+
+def test_token_signed_with_rotated_key_is_accepted():
+    token = jwt.encode({"sub": "test_user", "exp": datetime.now().timestamp() + 3600}, "old secret",
+                       algorithm=auth.ALGORITHM, headers={"kid": "old"})
+
+    assert auth.get_user_name_from_token(token) is None
+    with patch.dict(auth.KEYS, {"old": "old secret"}):
+        assert auth.get_user_name_from_token(token) == "test_user"
+
+
+@patch('app.auth.revocations')
+def test_revoked_token_is_rejected(mock_revocations):
+    token = auth.create_access_token({"sub": "test_user"})
+    mock_revocations.is_revoked.return_value = True
+
+    assert auth.get_user_name_from_token(token) is None
+
+
+@patch.dict(os.environ, {"JWT_KEYS": "2024b:new secret, 2024a:old secret"})
+def test_load_keys():
+    assert auth.load_keys() == ("2024b", {"2024b": "new secret", "2024a": "old secret"})
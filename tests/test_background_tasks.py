@@ -4,20 +4,24 @@ from unittest.mock import MagicMock, patch
 from app import background_tasks
 
 
-@patch('app.background_tasks.crud.get_upcoming_events')
-@patch('app.background_tasks.crud.get_subscribers')
-def test_send_reminder(mock_get_subscribers, mock_get_upcoming_events):
+@patch('app.background_tasks.SessionLocal')
+@patch('app.background_tasks.crud.get_upcoming_event_chunks')
+@patch('app.background_tasks.crud.get_subscriber_ids')
+def test_send_reminder(mock_get_subscriber_ids, mock_get_upcoming_event_chunks, mock_SessionLocal):
     mock_db = MagicMock()
     mock_event = MagicMock()
-    mock_subscriber = MagicMock()
+    other_event = MagicMock()
 
-    mock_get_upcoming_events.return_value = [mock_event]
-    mock_get_subscribers.return_value = [mock_subscriber]
+    mock_get_upcoming_event_chunks.return_value = [[mock_event], [other_event]]
+    mock_get_subscriber_ids.side_effect = lambda db, event_ids: {mock_event.id: [1, 2]} if mock_event.id in event_ids \
+        else {}
 
-    background_tasks.send_reminder(mock_db, timedelta(minutes=30))
+    result = background_tasks.send_reminder(mock_db, timedelta(minutes=30))
 
-    mock_get_upcoming_events.assert_called_once_with(mock_db, timedelta(minutes=30))
-    mock_get_subscribers.assert_called_once_with(mock_db, event_id=mock_event.id)
+    mock_get_upcoming_event_chunks.assert_called_once_with(mock_db, timedelta(minutes=30),
+                                                           background_tasks.REMINDER_CHUNK_SIZE)
+    assert mock_get_subscriber_ids.call_count == 2
+    assert result == background_tasks.ReminderResult(events_scanned=2, reminders_sent=2)
 
 
 @patch('app.background_tasks.SessionLocal')
@@ -30,3 +34,11 @@ def test_check_upcoming_events(mock_send_reminder, mock_SessionLocal):
 
     mock_SessionLocal.assert_called_once()
     mock_send_reminder.assert_called_once_with(mock_db, timedelta(minutes=30))
+
+
+def test_reminder_job_has_overrun_protection():
+    job = background_tasks.scheduler.get_job('check_upcoming_events')
+
+    assert job.max_instances == 1
+    assert job.coalesce
+    assert job.misfire_grace_time == background_tasks.MISFIRE_GRACE_SECONDS
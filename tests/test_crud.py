@@ -1,8 +1,13 @@
 from datetime import datetime, timedelta
+from typing import List
 from unittest.mock import MagicMock, patch
 
+import pytest
+from pydantic import TypeAdapter
+from sqlalchemy.exc import InvalidRequestError
+
 from sqlalchemy.orm import Session
-from app import crud, models, schemas
+from app import crud, geo, models, schemas
 
 
 def test_create_user():
@@ -129,3 +134,157 @@ def test_get_upcoming_events():
     events = crud.get_upcoming_events(db_mock, time_delta)
 
     assert events is not None
+
+
+def _seed_events(db, count):
+    db.add(models.User(username="owner", password_hash="x"))
+    for i in range(count):
+        db.add(models.Event(description=f"event {i}", location=f"location {i % 2}",
+                            scheduled_time=datetime.now() + timedelta(days=count - i), popularity=i,
+                            created_by="owner"))
+    db.commit()
+
+
+def test_get_event_rows_matches_orm_serialization(db):
+    _seed_events(db, 5)
+    adapter = TypeAdapter(List[schemas.Event])
+    orm_json = adapter.dump_json(adapter.validate_python(crud.get_events(db)))
+
+    rows = crud.get_event_rows(db)
+
+    assert schemas.EventRowList.dump_json(rows) == orm_json
+
+
+def test_get_event_rows_sorted(db):
+    _seed_events(db, 5)
+
+    rows = crud.get_event_rows(db, sort_field=schemas.SortField.popularity)
+
+    assert [row["popularity"] for row in rows] == [0, 1, 2, 3, 4]
+
+
+def test_get_event_rows_by_location(db):
+    _seed_events(db, 5)
+
+    rows = crud.get_event_rows_by_location(db, "location 0")
+
+    assert {row["location"] for row in rows} == {"location 0"}
+    assert len(rows) == 3
+
+
+def test_get_event_rows_projection(db):
+    _seed_events(db, 3)
+
+    rows = crud.get_event_rows(db, fields=["scheduled_time", "id"])
+
+    assert all(set(row) == {"id", "scheduled_time"} for row in rows)
+    assert schemas.EventRowList.dump_json(rows).startswith(b'[{"scheduled_time":')
+
+
+def test_get_events_load_only_and_raiseload(db):
+    _seed_events(db, 3)
+    db.expunge_all()
+
+    events = crud.get_events(db, fields=["id", "scheduled_time"])
+
+    assert "description" not in events[0].__dict__
+    with pytest.raises(InvalidRequestError):
+        events[0].subscriptions
+
+
+def test_bulk_create_subscriptions_skips_existing(db, count_queries):
+    _seed_events(db, 3)
+    crud.create_subscription(db, schemas.SubscriptionBase(event_id=1, user_id=1))
+
+    with count_queries(max_queries=1):
+        inserted = crud.bulk_create_subscriptions(db, [1, 2, 3], [1])
+
+    assert inserted == {(2, 1), (3, 1)}
+    assert db.query(models.Subscription).count() == 3
+
+
+def test_bulk_delete_subscriptions(db):
+    _seed_events(db, 3)
+    crud.bulk_create_subscriptions(db, [1, 2], [1])
+
+    deleted = crud.bulk_delete_subscriptions(db, [1, 3], [1])
+
+    assert deleted == {(1, 1)}
+    assert [subscription.event_id for subscription in db.query(models.Subscription)] == [2]
+
+
+def test_get_existing_event_and_user_ids(db):
+    _seed_events(db, 2)
+
+    assert crud.get_existing_event_ids(db, [1, 2, 5]) == {1, 2}
+    assert crud.get_existing_user_ids(db, [1, 2]) == {1}
+
+
+def test_get_user_event_rows_keyset_pages(db, count_queries):
+    _seed_events(db, 5)
+    crud.bulk_create_subscriptions(db, [1, 2, 4, 5], [1])
+
+    first = crud.get_user_event_rows(db, 1, limit=2)
+    last = first[-1]
+    with count_queries(max_queries=1):
+        second = crud.get_user_event_rows(db, 1, limit=2, after=(last["scheduled_time"], last["id"]))
+
+    assert [row["id"] for row in first + second] == [5, 4, 2, 1]
+
+
+def test_update_event_bumps_version_in_one_statement(db, count_queries):
+    _seed_events(db, 1)
+
+    with count_queries(max_queries=1):
+        updated = crud.update_event(db, 1, schemas.EventUpdate(popularity=42))
+
+    assert updated.popularity == 42
+    assert updated.version == 2
+
+
+def test_update_event_version_conflict(db):
+    _seed_events(db, 1)
+    crud.update_event(db, 1, schemas.EventUpdate(popularity=1), expected_version=1)
+
+    assert crud.update_event(db, 1, schemas.EventUpdate(popularity=2), expected_version=1) is None
+    assert crud.get_event_by_id(db, 1).popularity == 1
+
+
+def test_get_nearby_event_rows(db):
+    db.add(models.User(id=1, username="owner", password_hash="x"))
+    db.commit()
+    scheduled_time = datetime(2030, 1, 1)
+    places = [("Tel Aviv", 32.0853, 34.7818), ("Ramat Gan", 32.0684, 34.8248), ("Jerusalem", 31.7683, 35.2137),
+              ("Nowhere", None, None)]
+    for location, latitude, longitude in places:
+        crud.create_event(db, schemas.EventCreate(description="event", location=location, scheduled_time=scheduled_time,
+                                                  popularity=0, latitude=latitude, longitude=longitude), "owner")
+    crud.create_event(db, schemas.EventCreate(description="past", location="Tel Aviv", latitude=32.0853,
+                                              longitude=34.7818, scheduled_time=datetime(2020, 1, 1), popularity=0),
+                      "owner")
+
+    rows = crud.get_nearby_event_rows(db, 32.0853, 34.7818, radius_km=10, start=datetime(2029, 1, 1))
+
+    assert [(row["location"], row["distance_km"] < 5) for row in rows] == [("Tel Aviv", True), ("Ramat Gan", True)]
+    assert len(crud.get_nearby_event_rows(db, 32.0853, 34.7818, radius_km=100, start=datetime(2019, 1, 1))) == 4
+
+
+def test_update_event_coordinates_updates_geohash(db):
+    _seed_events(db, 1)
+
+    crud.update_event(db, 1, schemas.EventUpdate(latitude=32.0853, longitude=34.7818))
+
+    assert db.get(models.Event, 1).geohash == geo.encode(32.0853, 34.7818)
+
+
+def test_get_upcoming_event_chunks(db):
+    db.add(models.User(id=1, username="owner", password_hash="x"))
+    now = datetime.now()
+    db.add_all([models.Event(description=f"event {i}", location="Tel Aviv", scheduled_time=now + timedelta(minutes=i),
+                             popularity=0, created_by="owner") for i in (-5, 1, 2, 3, 4, 5, 40)])
+    db.commit()
+
+    chunks = list(crud.get_upcoming_event_chunks(db, timedelta(minutes=30), chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [row.id for chunk in chunks for row in chunk] == [2, 3, 4, 5, 6]
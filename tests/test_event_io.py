@@ -0,0 +1,93 @@
+import io
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import event_io, models
+from app.schemas import DataFormat
+
+CSV = (b"description,location,scheduled_time,popularity\n"
+       b"Concert,Tel Aviv,2030-01-01T20:00:00,5\n"
+       b"\"Talk, with a comma\",Haifa,2030-01-02 10:00:00,3\n")
+
+
+def _add_user(db):
+    db.add(models.User(id=1, username="owner", password_hash="x"))
+    db.commit()
+
+
+def test_import_csv(db):
+    _add_user(db)
+
+    assert event_io.import_events(db, io.BytesIO(CSV), DataFormat.csv, "owner") == 2
+
+    events = db.query(models.Event).order_by(models.Event.id).all()
+    assert [event.description for event in events] == ["Concert", "Talk, with a comma"]
+    assert {event.created_by for event in events} == {"owner"}
+
+
+def test_import_ndjson_skips_blank_lines(db):
+    _add_user(db)
+    lines = [json.dumps({"description": f"event {i}", "location": "Eilat", "scheduled_time": "2030-01-01T10:00:00",
+                         "popularity": i}) for i in range(3)]
+    data = "\n\n".join(lines).encode()
+
+    assert event_io.import_events(db, io.BytesIO(data), DataFormat.ndjson, "owner") == 3
+
+
+def test_invalid_row_reports_line_and_imports_nothing(db):
+    _add_user(db)
+    data = CSV + b"Broken,Eilat,not a date,1\n"
+
+    with pytest.raises(event_io.InvalidRow) as e:
+        event_io.import_events(db, io.BytesIO(data), DataFormat.csv, "owner")
+
+    assert e.value.line == 4
+    assert "scheduled_time" in str(e.value)
+    db.rollback()
+    assert db.query(models.Event).count() == 0
+
+
+def test_import_uses_copy_on_postgres():
+    db = MagicMock()
+    db.get_bind.return_value.dialect.name = "postgresql"
+    copied = []
+    cursor = db.connection.return_value.connection.cursor.return_value.__enter__.return_value
+    cursor.copy_expert.side_effect = lambda sql, stream: copied.append((sql, stream.read(8) + stream.read()))
+
+    assert event_io.import_events(db, io.BytesIO(CSV), DataFormat.csv, "owner") == 2
+
+    sql, data = copied[0]
+    assert sql.startswith("COPY events (description, location, scheduled_time, popularity")
+    assert data.splitlines()[1].startswith('"Talk, with a comma",Haifa,2030-01-02 10:00:00,3,')
+    db.commit.assert_called_once()
+
+
+@pytest.mark.parametrize("fmt", list(DataFormat))
+def test_export_round_trips(db, engine, fmt):
+    _add_user(db)
+    event_io.import_events(db, io.BytesIO(CSV), DataFormat.csv, "owner")
+
+    exported = b"".join(event_io.export_events(fmt, sessionmaker(bind=engine)))
+    db.query(models.Event).delete()
+    db.commit()
+
+    assert event_io.import_events(db, io.BytesIO(exported), fmt, "owner") == 2
+    assert db.query(models.Event.location).order_by(models.Event.id).all() == [("Tel Aviv",), ("Haifa",)]
+
+
+def test_export_sql_ndjson_never_quotes():
+    sql = event_io._export_sql(DataFormat.ndjson)
+
+    assert "row_to_json" in sql
+    assert "QUOTE E'\\x01'" in sql
+
+
+def test_iterator_reader():
+    reader = event_io.IteratorReader(iter(["ab", "cde", "f"]))
+
+    assert reader.read(4) == "abcd"
+    assert reader.read() == "ef"
+    assert reader.read(1) == ""
@@ -0,0 +1,39 @@
+import random
+
+from app import geo
+
+
+def test_encode_known_geohash():
+    assert geo.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geo.encode(42.605, -5.603, 5) == "ezs42"
+
+
+def test_successor():
+    assert geo.successor("u4pr") == "u4ps"
+    assert geo.successor("u4pz") == "u4q"
+    assert geo.successor("zz") is None
+
+
+def test_haversine():
+    # Tel Aviv to Jerusalem
+    assert 53 < geo.haversine_km(32.0853, 34.7818, 31.7683, 35.2137) < 55
+
+
+def test_covering_cells_contain_every_point_in_radius():
+    rng = random.Random(1)
+    for latitude, longitude, radius_km in [(32.0853, 34.7818, 5), (0.01, 179.99, 50), (-45, -0.001, 300)]:
+        cells = geo.covering_cells(latitude, longitude, radius_km)
+        assert len(cells) <= geo.MAX_CELLS
+        for _ in range(500):
+            lat = latitude + rng.uniform(-1, 1) * radius_km / geo.KM_PER_DEGREE
+            lon = (longitude + rng.uniform(-3, 3) * radius_km / geo.KM_PER_DEGREE + 180) % 360 - 180
+            if geo.haversine_km(latitude, longitude, lat, lon) <= radius_km:
+                assert any(geo.encode(lat, lon).startswith(cell) for cell in cells)
+
+
+def test_circle_around_pole_scans_everything():
+    assert geo.covering_cells(89.9, 0, 50) is None
+
+
+def test_cell_ranges_merge_adjacent_cells():
+    assert geo.cell_ranges(["u4pr", "u4ps", "u4pu", "zz"]) == [("u4pr", "u4pt"), ("u4pu", "u4pv"), ("zz", None)]
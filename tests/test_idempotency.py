@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import idempotency, models
+
+
+def test_first_request_reserves_key(db):
+    store = idempotency.IdempotencyStore()
+
+    assert store.begin(db, "key", "fp") is None
+    with pytest.raises(idempotency.IdempotencyConflict):
+        store.begin(db, "key", "fp")
+
+
+def test_completed_response_is_replayed(db, count_queries):
+    store = idempotency.IdempotencyStore()
+    store.begin(db, "key", "fp")
+    store.complete(db, "key", "fp", 200, b'{"id": 1}')
+
+    with count_queries(max_queries=0):
+        stored = store.begin(db, "key", "fp")
+
+    assert stored.body == b'{"id": 1}'
+    assert stored.status_code == 200
+
+
+def test_replay_from_db_when_not_cached(db):
+    idempotency.IdempotencyStore().begin(db, "key", "fp")
+    idempotency.IdempotencyStore().complete(db, "key", "fp", 200, b"[]")
+
+    stored = idempotency.IdempotencyStore().begin(db, "key", "fp")
+
+    assert stored.body == b"[]"
+
+
+def test_key_reused_with_different_payload(db):
+    store = idempotency.IdempotencyStore()
+    store.begin(db, "key", "fp")
+    store.complete(db, "key", "fp", 200, b"{}")
+
+    with pytest.raises(idempotency.IdempotencyKeyReused):
+        store.begin(db, "key", "other")
+
+
+def test_abandon_releases_key(db):
+    store = idempotency.IdempotencyStore()
+    store.begin(db, "key", "fp")
+
+    store.abandon(db, "key")
+
+    assert store.begin(db, "key", "fp") is None
+
+
+def test_expired_key_starts_over(db):
+    store = idempotency.IdempotencyStore(ttl=timedelta(seconds=-1))
+    store.begin(db, "key", "fp")
+    store.complete(db, "key", "fp", 200, b"{}")
+
+    assert store.begin(db, "key", "fp") is None
+
+
+def test_purge_expired(db):
+    db.add_all([
+        models.IdempotencyKey(key=f"old{i}", fingerprint="fp", expires_at=datetime.now() - timedelta(hours=1))
+        for i in range(5)
+    ])
+    db.add(models.IdempotencyKey(key="new", fingerprint="fp", expires_at=datetime.now() + timedelta(hours=1)))
+    db.commit()
+
+    assert idempotency.IdempotencyStore().purge_expired(db, batch_size=2) == 5
+    assert [row.key for row in db.query(models.IdempotencyKey)] == ["new"]
+
+
+def test_lru_evicts_oldest():
+    store = idempotency.IdempotencyStore(max_entries=2)
+    expires_at = datetime.now() + timedelta(hours=1)
+    for key in ("a", "b", "c"):
+        store._remember(key, idempotency.StoredResponse("fp", 200, b"", expires_at))
+
+    assert store._cached("a") is None
+    assert store._cached("c") is not None
+
+
+def test_make_key_is_scoped_per_user_and_path():
+    assert idempotency.make_key("u1", "/events/", "k") != idempotency.make_key("u2", "/events/", "k")
+    assert idempotency.make_key("u1", "/events/", "k") != idempotency.make_key("u1", "/events/batch_create/", "k")
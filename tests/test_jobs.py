@@ -0,0 +1,93 @@
+import json
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, jobs, models
+from app.schemas import JobKind, JobStatus
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _add_job(db, kind, payload, total, status="pending"):
+    db.merge(models.User(id=1, username="owner", password_hash="x"))
+    db.commit()
+    db_job = crud.create_job(db, kind.value, "owner", json.dumps(payload), total)
+    db_job.status = status
+    db.commit()
+    return db_job.id
+
+
+def _event(i):
+    return {"description": f"event {i}", "location": "Tel Aviv", "scheduled_time": "2030-01-01T10:00:00",
+            "popularity": i}
+
+
+@patch('app.jobs.CHUNK_SIZE', 2)
+def test_batch_create_job_runs_in_chunks(db, session_factory):
+    job_id = _add_job(db, JobKind.batch_create, {"events": [_event(i) for i in range(5)]}, 5)
+
+    jobs.run_job(job_id, session_factory)
+
+    db.expire_all()
+    db_job = crud.get_job(db, job_id)
+    assert db_job.status == JobStatus.succeeded.value
+    assert db_job.processed == 5
+    assert db.query(models.Event).count() == 5
+
+
+@patch('app.jobs.CHUNK_SIZE', 2)
+def test_failed_chunk_keeps_committed_chunks(db, session_factory):
+    events = [_event(0), _event(1), _event(2), _event(2)]
+    job_id = _add_job(db, JobKind.batch_create, {"events": events}, 4)
+
+    jobs.run_job(job_id, session_factory)
+
+    db.expire_all()
+    db_job = crud.get_job(db, job_id)
+    assert db_job.status == JobStatus.failed.value
+    assert db_job.processed == 2
+    assert db.query(models.Event).count() == 2
+
+
+def test_batch_update_and_delete_jobs(db, session_factory):
+    create_id = _add_job(db, JobKind.batch_create, {"events": [_event(i) for i in range(3)]}, 3)
+    jobs.run_job(create_id, session_factory)
+    update_id = _add_job(db, JobKind.batch_update, {"event_ids": [1, 2], "updates": [{"popularity": 7}] * 2}, 2)
+    jobs.run_job(update_id, session_factory)
+    crud.bulk_create_subscriptions(db, [1], [1])
+    delete_id = _add_job(db, JobKind.batch_delete, {"event_ids": [1, 3]}, 2)
+
+    jobs.run_job(delete_id, session_factory)
+
+    db.expire_all()
+    assert [(event.id, event.popularity) for event in db.query(models.Event)] == [(2, 7)]
+    assert db.query(models.Subscription).count() == 0
+
+
+def test_job_is_only_claimed_once(db, session_factory):
+    job_id = _add_job(db, JobKind.batch_delete, {"event_ids": []}, 0, status=JobStatus.running.value)
+
+    jobs.run_job(job_id, session_factory)
+
+    db.expire_all()
+    assert crud.get_job(db, job_id).status == JobStatus.running.value
+
+
+@patch('app.jobs.submit')
+def test_resume_unfinished_jobs(mock_submit, db, session_factory):
+    pending_id = _add_job(db, JobKind.batch_delete, {"event_ids": []}, 0)
+    stale_id = _add_job(db, JobKind.batch_delete, {"event_ids": []}, 0, status=JobStatus.running.value)
+    crud.get_job(db, stale_id).updated_at = datetime.now() - timedelta(hours=1)
+    _add_job(db, JobKind.batch_delete, {"event_ids": []}, 0, status=JobStatus.running.value)
+    db.commit()
+
+    resumed = jobs.resume_unfinished_jobs(session_factory)
+
+    assert sorted(resumed) == [pending_id, stale_id]
+    assert mock_submit.call_count == 2
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app import metrics
+
+
+def test_histogram_render():
+    histogram = metrics.Histogram("test_histogram_seconds", "test histogram", ("route",), buckets=(0.1, 1.0))
+    histogram.labels("/a").observe(0.05)
+    histogram.labels("/a").observe(0.5)
+    histogram.labels("/a").observe(5)
+
+    rendered = "\n".join(histogram.render())
+
+    assert '# TYPE test_histogram_seconds histogram' in rendered
+    assert 'test_histogram_seconds_bucket{route="/a",le="0.1"} 1' in rendered
+    assert 'test_histogram_seconds_bucket{route="/a",le="1.0"} 2' in rendered
+    assert 'test_histogram_seconds_bucket{route="/a",le="+Inf"} 3' in rendered
+    assert 'test_histogram_seconds_count{route="/a"} 3' in rendered
+
+
+def test_middleware_records_route_and_queries():
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine)
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT 2"))
+        return {"id": item_id}
+
+    client = TestClient(app)
+    assert client.get("/items/1").status_code == 200
+
+    rendered = metrics.render()
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 1' in rendered
+    assert 'http_request_db_queries_sum{method="GET",route="/items/{item_id}"} 2' in rendered
+    assert 'http_requests_in_flight 0.0' in rendered
+
+
+def test_record_job_lag():
+    job_event = MagicMock()
+    job_event.job_id = "test_lag_job"
+    job_event.scheduled_run_times = [datetime.now(timezone.utc) - timedelta(seconds=3)]
+
+    metrics.record_job_lag(job_event)
+
+    child = metrics.JOB_LAG.labels("test_lag_job")
+    assert sum(child.counts) == 1
+    assert child.sum >= 3
+
+
+def test_track_job():
+    with metrics.track_job("test_duration_job"):
+        pass
+
+    assert sum(metrics.JOB_DURATION.labels("test_duration_job").counts) == 1
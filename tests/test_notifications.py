@@ -0,0 +1,61 @@
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+from app import notifications
+
+
+def test_publish_reaches_subscribed_clients_only():
+    async def scenario():
+        feed = notifications.ChangeFeed()
+        feed.start(notifications.InProcessBackend(), asyncio.get_running_loop())
+        subscribed = feed.connect(1)
+        other = feed.connect(2)
+
+        feed.publish(10, "updated", [1, 3])
+        message = await asyncio.wait_for(subscribed.get(), timeout=1)
+
+        assert json.loads(message) == {"event_id": 10, "change": "updated"}
+        assert other.empty()
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_removes_client():
+    feed = notifications.ChangeFeed()
+    queue = feed.connect(1)
+    assert feed.client_count == 1
+
+    feed.disconnect(1, queue)
+
+    assert feed.client_count == 0
+
+
+def test_publish_splits_large_subscriber_lists():
+    feed = notifications.ChangeFeed()
+    backend = MagicMock()
+    feed.backend = backend
+
+    feed.publish(1, "canceled", range(notifications.USER_IDS_PER_MESSAGE * 2 + 1))
+
+    assert backend.publish.call_count == 3
+
+
+def test_slow_client_drops_oldest_message():
+    feed = notifications.ChangeFeed()
+    queue = feed.connect(1)
+    for event_id in range(notifications.CLIENT_QUEUE_SIZE + 1):
+        feed.dispatch(json.dumps({"event_id": event_id, "change": "updated", "user_ids": [1]}))
+
+    assert queue.qsize() == notifications.CLIENT_QUEUE_SIZE
+    assert json.loads(queue.get_nowait())["event_id"] == 1
+
+
+def test_publish_without_backend_is_noop():
+    feed = notifications.ChangeFeed()
+    feed.publish(1, "updated", [1])
+
+
+def test_format_sse():
+    assert notifications.format_sse('{"a": 1}') == 'data: {"a": 1}\n\n'
+    assert notifications.format_sse(None).startswith(":")
@@ -0,0 +1,75 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import models, popularity
+
+
+def _seed(db):
+    db.add(models.User(id=1, username="owner", password_hash="x"))
+    db.add_all([models.Event(id=i, description=f"event {i}", location="Tel Aviv",
+                             scheduled_time=datetime(2030, 1, 1), popularity=10, created_by="owner")
+                for i in (1, 2)])
+    db.commit()
+
+
+def test_flush_applies_coalesced_deltas_in_one_statement(db, count_queries):
+    _seed(db)
+    buffer = popularity.PopularityBuffer()
+    for _ in range(100):
+        buffer.add(1, 1)
+    buffer.add(2, -3)
+
+    with count_queries(max_queries=1):
+        assert buffer.flush(db) == 2
+
+    assert [event.popularity for event in db.query(models.Event).order_by(models.Event.id)] == [110, 7]
+    assert buffer.pending(1) == 0
+
+
+def test_flush_does_not_bump_version(db):
+    _seed(db)
+    buffer = popularity.PopularityBuffer()
+    buffer.add(1, 1)
+
+    buffer.flush(db)
+
+    assert db.get(models.Event, 1).version == 1
+
+
+def test_deltas_that_cancel_out_are_not_written(db, count_queries):
+    buffer = popularity.PopularityBuffer()
+    buffer.add(1, 2)
+    buffer.add(1, -2)
+
+    with count_queries(max_queries=0):
+        assert buffer.flush(db) == 0
+
+
+def test_failed_flush_keeps_deltas():
+    buffer = popularity.PopularityBuffer()
+    buffer.add(1, 5)
+    db = MagicMock()
+    db.execute.side_effect = RuntimeError("db down")
+
+    with pytest.raises(RuntimeError):
+        buffer.flush(db)
+
+    buffer.add(1, 1)
+    assert buffer.pending(1) == 6
+    db.rollback.assert_called_once()
+
+
+def test_stop_flushes_remaining_deltas(db, engine):
+    _seed(db)
+    buffer = popularity.PopularityBuffer()
+    session_factory = sessionmaker(bind=engine)
+    buffer.start(session_factory, interval=60)
+    buffer.add(1, 4)
+
+    buffer.stop(session_factory)
+
+    db.expire_all()
+    assert db.get(models.Event, 1).popularity == 14
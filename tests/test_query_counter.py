@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app import crud, models, schemas
+from app.query_counter import QueryBudgetExceeded, QueryCounter
+
+
+def _add_events(db, count):
+    db.add(models.User(username="owner", password_hash="x"))
+    for i in range(count):
+        db.add(models.Event(description=f"event {i}", location="Tel Aviv",
+                            scheduled_time=datetime.now() + timedelta(days=i), popularity=i, created_by="owner"))
+    db.commit()
+
+
+def test_counts_queries(engine):
+    with QueryCounter(engine) as counter:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT 2"))
+
+    assert counter.count == 2
+
+
+def test_max_queries_exceeded(engine):
+    with pytest.raises(QueryBudgetExceeded):
+        with QueryCounter(engine, max_queries=1):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                connection.execute(text("SELECT 2"))
+
+
+def test_repeated_statements_flagged(db, count_queries):
+    _add_events(db, 3)
+    events = crud.get_events(db)
+
+    with pytest.raises(QueryBudgetExceeded, match="possible N\\+1"):
+        with count_queries(max_repeats=1):
+            for event in events:
+                crud.get_subscribers(db, event_id=event.id)
+
+
+def test_slow_query_logged_with_explain(engine, caplog):
+    with QueryCounter(engine, slow_threshold=0) as counter:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT * FROM events WHERE id = :id"), {"id": 1})
+
+    statement, elapsed, plan = counter.slow_queries[0]
+    assert "FROM events" in statement
+    assert plan and "EXPLAIN failed" not in plan[0]
+    assert "Slow query" in caplog.text
+
+
+def test_get_events_query_budget(db, count_queries):
+    _add_events(db, 10)
+
+    with count_queries(max_queries=1):
+        events = crud.get_events(db)
+
+    assert len(events) == 10
+
+
+def test_create_event_query_budget(db, count_queries):
+    _add_events(db, 0)
+    event = schemas.EventCreate(description="new", location="Haifa", scheduled_time=datetime.now(), popularity=0)
+
+    with count_queries(max_queries=2):
+        crud.create_event(db, event, "owner")
+
+
+def test_update_event_query_budget(db, count_queries):
+    _add_events(db, 1)
+
+    with count_queries(max_queries=3, max_repeats=1):
+        crud.update_event(db, 1, schemas.EventUpdate(popularity=5))
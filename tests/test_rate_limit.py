@@ -0,0 +1,65 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import auth, rate_limit
+from app.rate_limit import Limit
+
+
+def test_bucket_allows_burst_then_refills():
+    backend = rate_limit.InMemoryBackend()
+    limit = Limit(rate=1, burst=2)
+
+    assert backend.take("k", limit, now=0)[0]
+    assert backend.take("k", limit, now=0)[0]
+    allowed, retry_after = backend.take("k", limit, now=0)
+    assert not allowed
+    assert retry_after == 1
+    assert backend.take("k", limit, now=1)[0]
+
+
+def test_buckets_are_per_client():
+    limiter = rate_limit.RateLimiter({"read": Limit(rate=1, burst=1)}, {})
+
+    assert limiter.check("read", "user:a", now=0)[0]
+    assert not limiter.check("read", "user:a", now=0)[0]
+    assert limiter.check("read", "user:b", now=0)[0]
+
+
+def test_global_limit_applies_to_all_clients():
+    limiter = rate_limit.RateLimiter({"login": Limit(rate=100, burst=100)}, {"login": Limit(rate=1, burst=1)})
+
+    assert limiter.check("login", "ip:1", now=0)[0]
+    assert not limiter.check("login", "ip:2", now=0)[0]
+
+
+def test_route_class():
+    assert rate_limit.route_class("POST", "/token") == "login"
+    assert rate_limit.route_class("PUT", "/events/batch_update/1,2") == "batch"
+    assert rate_limit.route_class("GET", "/events/export") == "batch"
+    assert rate_limit.route_class("GET", "/events/") == "read"
+    assert rate_limit.route_class("DELETE", "/event/{id}") == "write"
+
+
+def test_parse_limit():
+    assert rate_limit.parse_limit("0.5,3") == Limit(rate=0.5, burst=3)
+
+
+def test_middleware_returns_429_with_retry_after():
+    app = FastAPI()
+    app.add_middleware(rate_limit.RateLimitMiddleware,
+                       limiter=rate_limit.RateLimiter({"read": Limit(rate=0.1, burst=1)}, {}))
+
+    @app.get("/items")
+    def items():
+        return []
+
+    client = TestClient(app)
+    token = auth.create_access_token({"sub": "test_user"})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/items", headers=headers).status_code == 200
+    response = client.get("/items", headers=headers)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "10"
+    # anonymous callers are keyed by IP and get their own bucket
+    assert client.get("/items").status_code == 200
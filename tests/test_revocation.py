@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from app import models, revocation
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = revocation.BloomFilter(capacity=1000)
+    for i in range(1000):
+        bloom.add(f"jti{i}")
+
+    assert all(f"jti{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_unrevoked_token_is_checked_without_db(engine, count_queries):
+    revocations = revocation.RevocationList(session_factory=sessionmaker(bind=engine))
+
+    with count_queries(max_queries=0):
+        assert not revocations.is_revoked("jti")
+
+
+def test_revoke(db, engine):
+    revocations = revocation.RevocationList(session_factory=sessionmaker(bind=engine))
+
+    assert revocations.revoke(db, "jti", datetime.now() + timedelta(hours=1))
+    assert not revocations.revoke(db, "jti", datetime.now() + timedelta(hours=1))
+    assert revocations.is_revoked("jti")
+
+
+def test_sync_picks_up_revocations_of_other_workers(db, engine):
+    session_factory = sessionmaker(bind=engine)
+    this_worker = revocation.RevocationList(session_factory=session_factory)
+    other_worker = revocation.RevocationList(session_factory=session_factory)
+    this_worker.reload(db)
+
+    other_worker.revoke(db, "jti", datetime.now() + timedelta(hours=1))
+    assert not this_worker.is_revoked("jti")
+    this_worker.sync(db)
+
+    assert this_worker.is_revoked("jti")
+
+
+def test_reload_skips_expired_and_purge_deletes_them(db):
+    revocations = revocation.RevocationList()
+    revocations.revoke(db, "old", datetime.now() - timedelta(hours=1))
+    revocations.revoke(db, "new", datetime.now() + timedelta(hours=1))
+
+    revocations.reload(db)
+    assert "old" not in revocations._bloom
+
+    assert revocations.purge_expired(db) == 1
+    assert [row.jti for row in db.query(models.RevokedToken)] == ["new"]
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_MAX_INSTANCES
+from sqlalchemy.orm import sessionmaker
+
+from app import models, scheduler_stats
+
+
+def test_track_run_measures_duration():
+    with scheduler_stats.track_run("job") as stats:
+        stats.events_scanned = 3
+
+    assert stats.duration_seconds >= 0
+    assert stats.events_scanned == 3
+
+
+def test_record_executed_run(db, engine):
+    with scheduler_stats.track_run("check_upcoming_events") as stats:
+        stats.events_scanned, stats.reminders_sent = 10, 4
+    scheduled = datetime.now(timezone.utc) - timedelta(seconds=2)
+    job_event = SimpleNamespace(code=EVENT_JOB_EXECUTED, job_id="check_upcoming_events", scheduled_run_time=scheduled,
+                                retval=stats, exception=None)
+
+    scheduler_stats.record_run(job_event, sessionmaker(bind=engine))
+
+    run = db.query(models.SchedulerRun).one()
+    assert run.status == "succeeded"
+    assert 1.5 < run.lag_seconds < 10
+    assert (run.events_scanned, run.reminders_sent) == (10, 4)
+
+
+def test_record_skipped_run(db, engine):
+    job_event = SimpleNamespace(code=EVENT_JOB_MAX_INSTANCES, job_id="check_upcoming_events",
+                                scheduled_run_times=[datetime.now(timezone.utc)])
+
+    scheduler_stats.record_run(job_event, sessionmaker(bind=engine))
+
+    run = db.query(models.SchedulerRun).one()
+    assert run.status == "skipped"
+    assert run.duration_seconds is None
+
+
+def test_stats_summarize_recent_runs(db):
+    now = datetime.now()
+    db.add_all([models.SchedulerRun(job="check_upcoming_events", status="succeeded", scheduled_at=now,
+                                    duration_seconds=duration, lag_seconds=0.1, events_scanned=duration * 10)
+                for duration in range(1, 11)])
+    db.add(models.SchedulerRun(job="check_upcoming_events", status="missed", scheduled_at=now))
+    db.add(models.SchedulerRun(job="old", status="succeeded", scheduled_at=now - timedelta(days=30)))
+    db.commit()
+
+    stats = scheduler_stats.get_stats(db)
+
+    reminders = stats["check_upcoming_events"]
+    assert (reminders["runs"], reminders["succeeded"], reminders["missed"]) == (11, 10, 1)
+    assert (reminders["duration_p50_seconds"], reminders["duration_max_seconds"]) == (5, 10)
+    assert reminders["events_scanned_max"] == 100
+    assert scheduler_stats.purge_old_runs(db) == 1
@@ -27,6 +27,8 @@ def test_event_base():
         "location": "Test Location",
         "scheduled_time": datetime.now(),
         "popularity": 0,
+        "latitude": 32.08,
+        "longitude": 34.78,
     }
     event = EventBase(**event_data)
     assert event.dict() == event_data
@@ -52,6 +54,8 @@ def test_event_create():
         "location": "Test Location",
         "scheduled_time": datetime.now(),
         "popularity": 0,
+        "latitude": None,
+        "longitude": None,
     }
     event_create = EventCreate(**event_create_data)
     assert event_create.dict() == event_create_data
@@ -80,6 +84,9 @@ def test_event():
         "creation_time": datetime.now(),
         "popularity": 0,
         "created_by": "testuser",
+        "version": 1,
+        "latitude": None,
+        "longitude": None,
     }
     event = Event(**event_data)
     assert event.dict() == event_data
@@ -108,6 +115,8 @@ def test_event_update():
         "location": "Updated Event Location",
         "scheduled_time": datetime.now(),
         "popularity": 1,
+        "latitude": 32.08,
+        "longitude": 34.78,
     }
     event_update = EventUpdate(**event_update_data)
     assert event_update.dict() == event_update_data
@@ -115,7 +124,26 @@ def test_event_update():
     # Invalid EventUpdate instance (all fields are None)
     invalid_event_update_data = {}
     event_update = EventUpdate(**invalid_event_update_data)
-    assert event_update.dict() == {"description": None, "location": None, "scheduled_time": None, "popularity": None}
+    assert event_update.dict() == {"description": None, "location": None, "scheduled_time": None, "popularity": None,
+                                   "latitude": None, "longitude": None}
+
+
+def test_coordinates_must_be_given_together():
+    event_data = {"description": "Test Event", "location": "Test Location", "scheduled_time": datetime.now(),
+                  "popularity": 0, "latitude": 32.08}
+    try:
+        EventCreate(**event_data)
+    except ValidationError:
+        pass
+    else:
+        assert False, "Validation should have failed"
+
+    try:
+        EventUpdate(longitude=34.78)
+    except ValidationError:
+        pass
+    else:
+        assert False, "Validation should have failed"
 
 
 def test_user_base():